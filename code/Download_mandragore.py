@@ -4,6 +4,9 @@ import pandas as pd
 import re
 from pathlib import Path
 
+from database import upsert_scraped_rows, image_keywords
+from sketches import KeywordStats, STATS_FILE
+
 def url_to_soup(query:str, page_num) -> BeautifulSoup:
     """
     Envoie une requête GET à l'URL de recherche de Mandragore pour le mot-clé donné.
@@ -213,7 +216,8 @@ def retrieve_img_data(query:str, page_num:int) -> list[list[str]]:
 
     return all_data
 
-def browse_results(query: str, output_folder:str) -> None:
+def browse_results(query: str, output_folder:str, db_path: str | Path | None = None,
+                   stats: KeywordStats | None = None) -> None:
     """
     Lance une recherche sur Mandragore, récupère toutes les pages de résultats pour un mot-clé donné,
     extrait les métadonnées des images, puis exporte le tout dans un fichier CSV.
@@ -221,10 +225,15 @@ def browse_results(query: str, output_folder:str) -> None:
     Paramètres :
     - query (str) : le mot-clé de recherche
     - output_folder (str) : dossier de sortie pour le CSV
+    - db_path (str | Path, optionnel) : base SQLite dans laquelle enregistrer les résultats
+    - stats (KeywordStats, optionnel) : statistiques approchées mises à jour à chaque page
+      (pendant le crawl, les paires de mots-clés ne sont comptées qu'avec db_path,
+      qui garde tous les mots-clés de chaque image ; merge_csv les recompte)
 
     Effets :
     - Affiche les progrès dans la console
     - Crée un fichier CSV nommé 'gallica_data_<query>.csv'
+    - Si db_path est fourni : insère ou met à jour (upsert) chaque page dans la base
     """
     
     all_data = []
@@ -235,6 +244,9 @@ def browse_results(query: str, output_folder:str) -> None:
         return
     
     print(f"🔍 {total_pages} page(s) trouvée(s) pour la recherche : {query}")
+    if stats is not None and not db_path:
+        print("⚠️ Sans db_path, les paires de mots-clés ne sont pas comptées pendant le crawl "
+              "(elles le seront par merge_csv).")
 
     # Boucle de pagination (1..total_pages inclus)
     for page_num in range(1, total_pages+1):
@@ -245,6 +257,14 @@ def browse_results(query: str, output_folder:str) -> None:
             page_data = retrieve_img_data(query, page_num)
             if page_data:
                 all_data.extend(page_data)
+                known_keywords = None
+                if db_path:
+                    if stats is not None:
+                        # mots-clés des images avant cette page, pour les paires
+                        known_keywords = image_keywords(db_path, page_data)
+                    upsert_scraped_rows(db_path, page_data, query)
+                if stats is not None:
+                    stats.update_rows(page_data, query, known_keywords)
             else:
                 print(f"⚠️ Aucune donnée extraite sur la page {page_num}")
         
@@ -266,11 +286,14 @@ def browse_results(query: str, output_folder:str) -> None:
 
     print(f"✅ {len(all_data)} enregistrement(s) exporté(s) dans '{output_file}")
 
-def download_from_list(list_mandragore_file, output_folder) -> None:
+def download_from_list(list_mandragore_file, output_folder, db_path=None, stats=None) -> None:
     
     with open(list_mandragore_file, 'r') as kw_file:
         for kw in kw_file:
-            browse_results(kw.strip(), output_folder)
+            browse_results(kw.strip(), output_folder, db_path, stats)
+            # statistiques enregistrées après chaque mot-clé (lisibles pendant le crawl)
+            if stats is not None:
+                stats.save(Path(output_folder) / STATS_FILE)
 
 list_mandragore_file = None
 output_folder = None
@@ -0,0 +1,263 @@
+from typing import Any, Iterable
+from pathlib import Path
+import pandas as pd
+
+from captions import normalize_captions
+
+
+
+# ---------------------------------------
+#        Agrégats précalculés (cube)
+# ---------------------------------------
+
+# Deux tables de comptages, calculées en fin de nettoyage :
+# - images : nombre d'images distinctes (ms_folio, caption)
+#   par caption × siecle × pays_region
+# - mots-clés : nombre d'associations image / mot-clé
+#   par caption × siecle × pays_region × mot_cle
+# Les graphiques du notebook lisent ces comptages au lieu de parcourir le corpus.
+
+AGG_IMAGES_FILE = "mandragore_nh_agregats_images.csv"
+AGG_KW_FILE = "mandragore_nh_agregats_mots_cles.csv"
+
+IMAGE_DIMS = ["caption", "siecle", "pays_region"]
+KW_DIMS = IMAGE_DIMS + ["mot_cle"]
+IMAGE_KEY = ["ms_folio", "caption"]
+
+
+def _count(df: pd.DataFrame, dims: list[str]) -> pd.DataFrame:
+    """
+    Compte les lignes d'un DataFrame par combinaison de dimensions.
+
+    Paramètres :
+    - df : DataFrame contenant les colonnes dims
+    - dims : dimensions du comptage (list[str])
+
+    Retour :
+    - DataFrame dims + 'counts' (les valeurs manquantes forment leur propre groupe)
+    """
+
+    return (
+        df.groupby(dims, dropna=False)
+          .size()
+          .reset_index(name="counts")
+    )
+
+def _merge_counts(old: pd.DataFrame, new: pd.DataFrame, dims: list[str]) -> pd.DataFrame:
+    """
+    Additionne deux tables de comptages ayant les mêmes dimensions.
+    """
+
+    return (
+        pd.concat([old, new], ignore_index=True)
+          .groupby(dims, dropna=False)["counts"]
+          .sum()
+          .reset_index()
+    )
+
+def aggregate_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcule les deux tables de comptages à partir de lignes du CSV global
+    (une ligne par couple image / mot-clé).
+
+    Paramètres :
+    - df : DataFrame nettoyé (colonnes 'ms_folio', 'caption', 'siecle',
+      'pays_region', 'mot_cle')
+
+    Retour :
+    - (agrégat images, agrégat mots-clés) (tuple de DataFrame)
+    """
+
+    images = df.drop_duplicates(subset=IMAGE_KEY)
+    return _count(images, IMAGE_DIMS), _count(df, KW_DIMS)
+
+def build_aggregates(nh_folder: str | Path) -> None:
+    """
+    Calcule les agrégats à partir du fichier CSV global nettoyé et les enregistre.
+
+    Paramètres :
+    - nh_folder : dossier contenant le fichier CSV global (str ou Path)
+
+    Effets :
+    - Crée (ou remplace) les fichiers d'agrégats images et mots-clés dans nh_folder
+    """
+
+    nh_folder = Path(nh_folder)
+    df = pd.read_csv(nh_folder / "mandragore_nh_global.csv", sep=";",
+                     usecols=IMAGE_KEY + ["siecle", "pays_region", "mot_cle"])
+
+    cube_images, cube_kw = aggregate_frame(df)
+
+    cube_images.to_csv(nh_folder / AGG_IMAGES_FILE, index=False, sep=";")
+    cube_kw.to_csv(nh_folder / AGG_KW_FILE, index=False, sep=";")
+    print(f"Agrégats créés : {AGG_IMAGES_FILE}, {AGG_KW_FILE}")
+
+def load_aggregates(nh_folder: str | Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Charge les agrégats enregistrés par build_aggregates.
+
+    Paramètres :
+    - nh_folder : dossier contenant les fichiers d'agrégats (str ou Path)
+
+    Retour :
+    - (agrégat images, agrégat mots-clés) (tuple de DataFrame)
+    """
+
+    nh_folder = Path(nh_folder)
+    return (
+        pd.read_csv(nh_folder / AGG_IMAGES_FILE, sep=";"),
+        pd.read_csv(nh_folder / AGG_KW_FILE, sep=";"),
+    )
+
+def update_aggregates(new_rows: pd.DataFrame,
+                      nh_folder: str | Path,
+                      known_rows: Iterable[tuple[str, str, str]] | None = None) -> None:
+    """
+    Ajoute aux agrégats enregistrés les comptages de nouvelles lignes,
+    sans recalculer le corpus existant.
+
+    Paramètres :
+    - new_rows : nouvelles lignes nettoyées (mêmes colonnes que le CSV global)
+    - nh_folder : dossier contenant les agrégats et le CSV global (str ou Path)
+    - known_rows : triplets (ms_folio, caption, mot_cle) déjà comptés (optionnel) ;
+      à défaut, lus dans le CSV global (ces trois colonnes seulement)
+
+    Effets :
+    - Réécrit les fichiers d'agrégats avec les comptages mis à jour
+
+    Règles :
+    - À appeler avant d'ajouter new_rows au CSV global
+    - Une image déjà connue n'est pas recomptée dans l'agrégat images
+    - Un couple image / mot-clé déjà connu (ex : page recrawlée) n'est pas
+      recompté dans l'agrégat mots-clés ; seuls les nouveaux mots-clés sont ajoutés
+    """
+
+    nh_folder = Path(nh_folder)
+    cube_images, cube_kw = load_aggregates(nh_folder)
+    row_key = IMAGE_KEY + ["mot_cle"]
+
+    if known_rows is None:
+        known = pd.read_csv(nh_folder / "mandragore_nh_global.csv", sep=";", usecols=row_key)
+    else:
+        known = pd.DataFrame(list(known_rows), columns=row_key)
+
+    # couples image / mot-clé absents du corpus existant
+    new_rows = new_rows.drop_duplicates(subset=row_key)
+    keys = pd.MultiIndex.from_frame(new_rows[row_key])
+    new_rows = new_rows[~keys.isin(pd.MultiIndex.from_frame(known[row_key]))]
+
+    # images absentes du corpus existant
+    keys = pd.MultiIndex.from_frame(new_rows[IMAGE_KEY])
+    is_new = ~keys.isin(pd.MultiIndex.from_frame(known[IMAGE_KEY]))
+    new_images, _ = aggregate_frame(new_rows[is_new])
+    new_kw = _count(new_rows, KW_DIMS)
+
+    cube_images = _merge_counts(cube_images, new_images, IMAGE_DIMS)
+    cube_kw = _merge_counts(cube_kw, new_kw, KW_DIMS)
+
+    cube_images.to_csv(nh_folder / AGG_IMAGES_FILE, index=False, sep=";")
+    cube_kw.to_csv(nh_folder / AGG_KW_FILE, index=False, sep=";")
+    print(f"Agrégats mis à jour : {len(new_rows)} ligne(s) ajoutée(s)")
+
+def counted_rows(nh_folder: str | Path) -> pd.DataFrame | None:
+    """
+    Lit les couples image / mot-clé déjà comptés dans les agrégats, avant que
+    le nettoyage ne réécrive le CSV global.
+
+    Paramètres :
+    - nh_folder : dossier contenant les agrégats et le CSV global (str ou Path)
+
+    Retour :
+    - DataFrame ('ms_folio', 'caption', 'mot_cle'), ou None si les agrégats
+      ou le CSV global n'existent pas encore
+    """
+
+    nh_folder = Path(nh_folder)
+    paths = [nh_folder / AGG_IMAGES_FILE, nh_folder / AGG_KW_FILE, nh_folder / "mandragore_nh_global.csv"]
+    if not all(path.exists() for path in paths):
+        return None
+
+    # usecols garde l'ordre du fichier : colonnes remises dans l'ordre des triplets
+    row_key = IMAGE_KEY + ["mot_cle"]
+    return pd.read_csv(paths[-1], sep=";", usecols=row_key)[row_key]
+
+def refresh_aggregates(nh_folder: str | Path, known_rows: pd.DataFrame | None = None) -> int:
+    """
+    Met à jour les agrégats en fin de nettoyage : seules les lignes du CSV global
+    absentes de known_rows sont comptées ; sans known_rows, tout est recalculé.
+
+    Paramètres :
+    - nh_folder : dossier contenant le CSV global nettoyé (str ou Path)
+    - known_rows : couples déjà comptés, lus par counted_rows avant le nettoyage
+      (DataFrame, optionnel)
+
+    Retour :
+    - Nombre de lignes du CSV global (int)
+
+    Règles :
+    - Les lignes retirées du corpus ne sont pas décomptées ; après une suppression
+      ou un changement des règles de nettoyage, appeler build_aggregates
+    """
+
+    if known_rows is None:
+        build_aggregates(nh_folder)
+        return len(pd.read_csv(Path(nh_folder) / "mandragore_nh_global.csv", sep=";", usecols=["mot_cle"]))
+
+    df = pd.read_csv(Path(nh_folder) / "mandragore_nh_global.csv", sep=";",
+                     usecols=IMAGE_KEY + ["siecle", "pays_region", "mot_cle"])
+    update_aggregates(df, nh_folder, known_rows.itertuples(index=False, name=None))
+    return len(df)
+
+def regroup_captions(cube: pd.DataFrame,
+                     kw_to_cleaned: dict[str, str],
+                     kw_to_remove: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Applique les règles de regroupement des légendes à un agrégat puis
+    additionne les comptages des légendes regroupées.
+
+    Paramètres :
+    - cube : agrégat images ou mots-clés (DataFrame)
+    - kw_to_cleaned : dictionnaire sous-chaîne -> légende regroupée (dict)
+    - kw_to_remove : légendes à supprimer (itérable de str)
+
+    Retour :
+    - Agrégat avec les légendes regroupées (DataFrame)
+    """
+
+    dims = [c for c in cube.columns if c != "counts"]
+    cube = normalize_captions(cube, kw_to_cleaned, kw_to_remove)
+    return cube.groupby(dims, dropna=False)["counts"].sum().reset_index()
+
+def query_counts(cube: pd.DataFrame,
+                 by: str | list[str] = "caption",
+                 **filters: Any) -> pd.Series:
+    """
+    Interroge un agrégat : filtre sur certaines dimensions puis somme par d'autres.
+
+    Paramètres :
+    - cube : agrégat images ou mots-clés (DataFrame)
+    - by : dimension(s) de regroupement (str ou list[str], défaut 'caption')
+    - filters : valeurs imposées par dimension, une valeur ou une liste de valeurs
+      (ex : siecle="XVe siècle", pays_region=["France", "Italie"])
+
+    Retour :
+    - Série des comptages indexée par `by`, triée par ordre décroissant
+
+    Exemple :
+    - query_counts(cube_images, by="caption", siecle="XIVe siècle")
+    """
+
+    mask = pd.Series(True, index=cube.index)
+    for dim, value in filters.items():
+        if dim not in cube.columns:
+            raise ValueError(f"Dimension inconnue : '{dim}'. "
+                             f"Dimensions disponibles: {[c for c in cube.columns if c != 'counts']}")
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= cube[dim].isin(values)
+
+    return (
+        cube[mask]
+          .groupby(by, dropna=False)["counts"]
+          .sum()
+          .sort_values(ascending=False)
+    )
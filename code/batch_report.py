@@ -0,0 +1,283 @@
+from typing import Any, Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import re
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from aggregates import load_aggregates, regroup_captions, query_counts
+from captions import KW_TO_CLEANED, KW_TO_REMOVE
+from cooccurrences import frequent_keyword_sets
+from plots import plot_top_captions, plot_most_common
+from vocabulary import CSR_FOLDER, FOLIO_ATTRIBUTES, KeywordCSR, load_csr, select_folios
+
+
+
+# ---------------------------------------
+#      Rapport : rendu des figures par lot
+# ---------------------------------------
+
+# Chaque figure est décrite par une « tranche » (dict) :
+#   {"type": "captions", "top_n": 20, "filters": {"siecle": "XVe siècle"}}
+#   {"type": "cooccurrences", "ngram_size": 3, "top_n": 30, "filters": {"pays_region": "France"}}
+# Les figures sont rendues en parallèle ; chaque processus charge les données
+# une seule fois (agrégats + table CSR en mmap). Un manifeste garde l'empreinte
+# des données de chaque tranche (et la résolution) avec son statut : une figure
+# inchangée, ou une tranche déjà trouvée vide, n'est pas recalculée.
+# La table CSR et les attributs des folios sont préparés par le notebook
+# (vocabulary.prepare_report_data) ; le backend Agg n'est choisi que dans les
+# processus du rapport, pour ne pas changer celui du notebook à l'import.
+
+MANIFEST_FILE = "manifeste.json"
+
+# Données chargées une fois par processus (voir _init_worker)
+_DATA: dict[str, Any] = {}
+
+
+def _init_worker(nh_folder: str,
+                 kw_to_cleaned: dict[str, str] | None,
+                 kw_to_remove: list[str]) -> None:
+    """
+    Charge les données du rapport dans le processus courant (une seule fois).
+    """
+
+    matplotlib.use("Agg")  # rendu sans affichage dans les processus du rapport
+    folder = Path(nh_folder) / CSR_FOLDER
+    cube_images, _ = load_aggregates(nh_folder)
+    if kw_to_cleaned:
+        cube_images = regroup_captions(cube_images, kw_to_cleaned, kw_to_remove)
+
+    _DATA["cube_images"] = cube_images
+    _DATA["csr"] = load_csr(folder, mmap=True)
+    _DATA["attributes"] = {
+        col: np.load(folder / f"{col}.npy", mmap_mode='r') for col in FOLIO_ATTRIBUTES
+    }
+
+def slice_name(spec: dict[str, Any]) -> str:
+    """
+    Construit un nom de fichier lisible et stable pour une tranche.
+
+    Paramètres :
+    - spec : description de la tranche (dict)
+
+    Retour :
+    - Nom sans extension (str), ex : "cooccurrences_3_siecle-XVe-siecle"
+    """
+
+    if "name" in spec:
+        return spec["name"]
+
+    parts = [spec["type"]]
+    if spec["type"] == "cooccurrences":
+        parts.append(str(spec.get("ngram_size", 3)))
+    for dim, value in sorted(spec.get("filters", {}).items()):
+        values = value if isinstance(value, list) else [value]
+        parts.append(dim + "-" + "-".join(str(v) for v in values))
+
+    name = "_".join(parts)
+    return re.sub(r"[^\w\-]+", "-", name).strip("-")
+
+def _select_csr(csr: KeywordCSR, filters: dict[str, Any]) -> KeywordCSR:
+    """
+    Restreint la table CSR aux folios satisfaisant les filtres (siecle, pays_region).
+    """
+
+    mask = np.ones(len(csr.folios), dtype=bool)
+    for dim, value in filters.items():
+        if dim not in _DATA["attributes"]:
+            raise ValueError(f"Filtre non disponible pour les cooccurrences : '{dim}'. "
+                             f"Filtres disponibles: {FOLIO_ATTRIBUTES}")
+        values = value if isinstance(value, list) else [value]
+        mask &= np.isin(_DATA["attributes"][dim], [str(v) for v in values])
+
+    return select_folios(csr, mask)
+
+def _slice_data(spec: dict[str, Any], dpi: int) -> tuple[Any, str]:
+    """
+    Calcule les données d'entrée d'une tranche et leur empreinte.
+
+    Retour :
+    - (données de la tranche, empreinte sha256 de la description, de la
+      résolution et des données)
+    """
+
+    h = hashlib.sha256(json.dumps({**spec, "dpi": dpi}, sort_keys=True,
+                                  ensure_ascii=False).encode())
+    filters = spec.get("filters", {})
+
+    if spec["type"] == "captions":
+        data = query_counts(_DATA["cube_images"], by="caption", **filters)
+        h.update(data.to_json().encode())
+    elif spec["type"] == "cooccurrences":
+        data = _select_csr(_DATA["csr"], filters)
+        h.update(np.ascontiguousarray(data.offsets).tobytes())
+        h.update(np.ascontiguousarray(data.ids).tobytes())
+    else:
+        raise ValueError(f"Type de tranche inconnu : '{spec['type']}'")
+
+    return data, h.hexdigest()
+
+def render_slice(spec: dict[str, Any],
+                 output_dir: str,
+                 previous: dict[str, str] | None,
+                 dpi: int = 300) -> tuple[str, str, str]:
+    """
+    Rend la figure d'une tranche, sauf si ses données n'ont pas changé.
+
+    Paramètres :
+    - spec : description de la tranche (dict)
+    - output_dir : dossier des figures (str)
+    - previous : entrée du manifeste au rapport précédent, {"empreinte", "statut"}
+      (dict ou None)
+    - dpi : résolution des figures (int, défaut 300)
+
+    Retour :
+    - (nom de la tranche, empreinte, statut "rendue" / "inchangée" / "vide")
+    """
+
+    name = slice_name(spec)
+    path = Path(output_dir) / f"{name}.png"
+    data, digest = _slice_data(spec, dpi)
+
+    # une tranche vide n'a pas de figure : son statut suffit
+    if previous and previous.get("empreinte") == digest \
+            and (previous.get("statut") == "vide" or path.exists()):
+        return name, digest, "inchangée"
+
+    if spec["type"] == "captions":
+        if data.empty:
+            return name, digest, "vide"
+        fig, _ = plot_top_captions(counts=data, top_n=spec.get("top_n", 20),
+                                   savepath=str(path.with_suffix("")), dpi=dpi, show=False)
+    else:
+        size = spec.get("ngram_size", 3)
+        top_cooc = frequent_keyword_sets(data, min_n=size, max_n=size,
+                                         min_support=spec.get("min_support", 2),
+                                         top_k=spec.get("top_n", 20))
+        if not top_cooc.get(size):
+            return name, digest, "vide"
+        fig, _ = plot_most_common(data, top_cooc, n_top=spec.get("top_n", 20), ngram_size=size,
+                                  save_path=str(path), dpi=dpi, show=False)
+
+    plt.close(fig)
+    return name, digest, "rendue"
+
+def default_specs(nh_folder: str | Path,
+                  ngram_sizes: Iterable[int] = (2, 3, 4, 5)) -> list[dict[str, Any]]:
+    """
+    Construit les tranches du rapport complet : corpus entier, chaque siècle et
+    chaque pays/région, pour les légendes et chaque taille de cooccurrences.
+
+    Paramètres :
+    - nh_folder : dossier des données préparées (str ou Path)
+    - ngram_sizes : tailles de cooccurrences (itérable d'int, défaut 2 à 5)
+
+    Retour :
+    - Liste de tranches (list[dict])
+    """
+
+    folder = Path(nh_folder) / CSR_FOLDER
+    if not folder.exists():
+        raise FileNotFoundError(f"Table CSR introuvable : {folder}. Elle est créée par "
+                                "vocabulary.prepare_report_data (notebook d'analyse).")
+    filters = [{}]
+    for col in FOLIO_ATTRIBUTES:
+        values = np.unique(np.load(folder / f"{col}.npy"))
+        filters.extend({col: str(v)} for v in values if v)
+
+    specs = []
+    for f in filters:
+        specs.append({"type": "captions", "top_n": 20, "filters": f})
+        for size in ngram_sizes:
+            specs.append({"type": "cooccurrences", "ngram_size": size, "top_n": 20, "filters": f})
+
+    return specs
+
+def run_report(specs: list[dict[str, Any]],
+               nh_folder: str | Path,
+               output_dir: str | Path,
+               workers: int | None = None,
+               dpi: int = 300,
+               kw_to_cleaned: dict[str, str] | None = KW_TO_CLEANED,
+               kw_to_remove: Iterable[str] = KW_TO_REMOVE) -> dict[str, str]:
+    """
+    Rend toutes les figures du rapport en parallèle, sans affichage.
+
+    Paramètres :
+    - specs : tranches à rendre (list[dict])
+    - nh_folder : dossier des données préparées (str ou Path)
+    - output_dir : dossier des figures, créé si besoin (str ou Path)
+    - workers : nombre de processus (int, défaut : nombre de cœurs)
+    - dpi : résolution des figures (int, défaut 300)
+    - kw_to_cleaned / kw_to_remove : règles de regroupement des légendes
+      (défaut : celles de captions.py, comme dans le notebook ; None pour les ignorer)
+
+    Retour :
+    - Dictionnaire nom de tranche -> statut
+
+    Effets :
+    - Écrit les figures .png et le manifeste (empreinte et statut par tranche) dans output_dir
+    """
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    # ancien format (empreinte seule) : les tranches sont recalculées
+    manifest = {name: entry for name, entry in manifest.items() if isinstance(entry, dict)}
+
+    statuses = {}
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(str(nh_folder), kw_to_cleaned, list(kw_to_remove))) as pool:
+        futures = {
+            pool.submit(render_slice, spec, str(output_dir),
+                        manifest.get(slice_name(spec)), dpi): spec
+            for spec in specs
+        }
+        for future in as_completed(futures):
+            try:
+                name, digest, status = future.result()
+            except Exception as e:
+                name, status = slice_name(futures[future]), "erreur"
+                print(f"❌ Erreur pour la tranche {name} : {e}")
+            else:
+                if status != "inchangée":
+                    manifest[name] = {"empreinte": digest, "statut": status}
+            statuses[name] = status
+
+    manifest_path.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+
+    counts = pd.Series(statuses).value_counts().to_dict()
+    print(f"Rapport terminé dans {output_dir} : {counts}")
+    return statuses
+
+
+
+if __name__ == "__main__":
+    matplotlib.use("Agg")
+    parser = argparse.ArgumentParser(
+        description="Rendu par lot des figures du rapport",
+        epilog="Prérequis : les agrégats (clean_files.py) et la table CSR "
+               f"{CSR_FOLDER}/, écrite par vocabulary.prepare_report_data "
+               "depuis le notebook d'analyse.")
+    parser.add_argument("nh_folder", help="dossier des données (agrégats + table CSR)")
+    parser.add_argument("output_dir", help="dossier des figures")
+    parser.add_argument("--specs", help="fichier JSON de tranches (défaut : rapport complet)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.specs:
+        with open(args.specs, "r", encoding="utf-8") as f:
+            specs = json.load(f)
+    else:
+        specs = default_specs(args.nh_folder)
+
+    run_report(specs, args.nh_folder, args.output_dir, workers=args.workers, dpi=args.dpi)
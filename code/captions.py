@@ -0,0 +1,116 @@
+from typing import Any, Iterable
+import pandas as pd
+import re
+
+
+
+# ---------------------------------------
+#       Normalisation des légendes
+# ---------------------------------------
+
+# Règles partagées par le notebook d'analyse et le rapport par lot :
+# - KW_TO_CLEANED : sous-chaîne (en minuscules) -> légende regroupée
+# - KW_TO_REMOVE : légendes (en minuscules) à écarter
+# Toutes les sous-chaînes sont compilées en une seule regex et les règles ne
+# sont évaluées qu'une fois par valeur distincte de la colonne.
+
+KW_TO_REMOVE = ["encadrement", "lettre ornée", "décor marginal", "lettre filigranée", "bout-de-ligne" , "bandeau"]
+KW_TO_CLEANED = {
+    'talisman' : 'Talisman',
+    'astro' : 'Astronomie/Astrologie',
+    'fable' : 'Fables',
+    'flore' : 'Flore',
+    'faune' : 'Faune',
+}
+
+
+def compile_caption_rules(kw_to_cleaned: dict[str, str]) -> re.Pattern | None:
+    """
+    Compile les sous-chaînes de regroupement en une seule expression régulière.
+
+    Paramètres :
+    - kw_to_cleaned : dictionnaire sous-chaîne -> légende regroupée (dict)
+
+    Retour :
+    - Regex compilée (alternative de toutes les sous-chaînes), ou None si aucune règle
+    """
+
+    if not kw_to_cleaned:
+        return None
+
+    # les plus longues d'abord, pour que l'alternative ne s'arrête pas sur un préfixe
+    keys = sorted(kw_to_cleaned, key=len, reverse=True)
+    return re.compile("|".join(re.escape(k) for k in keys))
+
+def resolve_caption(value: Any,
+                    kw_to_cleaned: dict[str, str],
+                    pattern: re.Pattern | None) -> Any:
+    """
+    Applique les règles de regroupement à une légende, dans l'ordre du dictionnaire.
+
+    Paramètres :
+    - value : légende d'origine (str, NaN, etc.)
+    - kw_to_cleaned : dictionnaire sous-chaîne -> légende regroupée (dict)
+    - pattern : regex issue de compile_caption_rules
+
+    Retour :
+    - Légende regroupée, ou valeur d'origine si aucune règle ne s'applique
+
+    Règles :
+    - La regex écarte en une recherche les légendes qu'aucune règle ne concerne
+    - Sinon, comme une succession d'appels à merge_captions, chaque règle
+      s'applique au résultat de la précédente
+    """
+
+    if pattern is None or not pattern.search(str(value).lower()):
+        return value
+
+    for kw_to_clean, kw_cleaned in kw_to_cleaned.items():
+        if kw_to_clean in str(value).lower():
+            value = kw_cleaned
+
+    return value
+
+def normalize_captions(df: pd.DataFrame,
+                       kw_to_cleaned: dict[str, str],
+                       kw_to_remove: Iterable[str] = (),
+                       col: str = 'caption') -> pd.DataFrame:
+    """
+    Regroupe puis filtre les légendes d'un DataFrame en une seule passe sur la colonne.
+    Remplace la succession merge_captions (une fois par règle) puis remove_captions.
+
+    Paramètres :
+    - df : DataFrame contenant la colonne des légendes
+    - kw_to_cleaned : dictionnaire sous-chaîne -> légende regroupée (dict)
+    - kw_to_remove : légendes à supprimer après regroupement (itérable de str)
+    - col : nom de la colonne des légendes (str, défaut 'caption')
+
+    Retour :
+    - Nouveau DataFrame avec les légendes regroupées, sans les lignes supprimées
+
+    Règles :
+    - Les règles ne sont évaluées que sur les valeurs distinctes de la colonne
+    - Les résultats sont ensuite reportés sur toutes les lignes par leur code
+    """
+
+    pattern = compile_caption_rules(kw_to_cleaned)
+    kw_to_remove = {str(kw).lower() for kw in kw_to_remove}
+
+    # codes : position de chaque ligne dans `uniques` (-1 pour les valeurs manquantes)
+    codes, uniques = pd.factorize(df[col])
+
+    new_values = [resolve_caption(v, kw_to_cleaned, pattern) for v in uniques]
+    keep = [str(v).lower() not in kw_to_remove for v in new_values]
+
+    # on ajoute la valeur manquante en dernière position, atteinte par le code -1
+    missing = df[col][codes == -1].iloc[0] if (codes == -1).any() else pd.NA
+    new_values.append(missing)
+    keep.append("nan" not in kw_to_remove)
+
+    values = pd.Series(new_values, dtype=object).to_numpy()
+    mask = pd.Series(keep, dtype=bool).to_numpy()[codes]
+
+    df_new = df[mask].copy()
+    df_new[col] = values[codes[mask]]
+
+    return df_new
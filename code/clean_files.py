@@ -1,8 +1,14 @@
 from typing import Any, Iterable
+from functools import partial
 from pathlib import Path
 import pandas as pd
 import re
 
+from keyword_index import build_keyword_index
+from aggregates import counted_rows, refresh_aggregates
+from database import DB_FILE, connect, read_frame, write_frame
+from profiling import profile_stage, new_run_id
+from sketches import KeywordStats, STATS_FILE
 
 
 # ---------------------------------------
@@ -161,6 +167,13 @@ dates_to_clean = [
 'Milieu-3e quart'
 ]
 
+# Liste de référence des mots-clés Mandragore
+KW_FILE = Path(__file__).resolve().parent.parent / "data" / "MotsCles.txt"
+
+# Colonnes du CSV global à la sortie de merge_csv
+MERGED_COLUMNS = ['img_url', 'manuscrit', 'folio', 'caption', 'texte', 'artiste',
+                  'lieu', 'date', 'mot_cle', 'ms_folio']
+
 egyptian_dynasty =  {'19e dynastie égyptienne' : '1296/92–1188 avant Jésus Christ',
   '20e dynastie égyptienne' : '1188–1069 avant Jésus Christ',
   '21e dynastie égyptienne' : '1069–943 avant Jésus Christ'}
@@ -189,19 +202,23 @@ def clean_kw(file: str | Path) -> None:
 def clean_csv(nh_folder: str | Path) -> None:
 
     """
-    Parcourt tous les fichiers du dossier et remplace les ';' par ':' dans leur contenu.
-    Réécrit chaque fichier sur place.
+    Parcourt les exports du crawler (gallica_data_<mot-clé>.csv) du dossier et
+    remplace les ';' par ':' dans leur contenu. Réécrit chaque fichier sur place.
 
     Paramètres :
     - nh_folder : dossier contenant les fichiers à nettoyer (str ou Path)
 
     Effets :
-    - Pour chaque fichier du dossier : remplace ';' par ':' puis écrase le fichier
+    - Pour chaque export du crawler : remplace ';' par ':' puis écrase le fichier
     - Affiche l'avancement dans la console
+
+    Règles :
+    - Les autres CSV du dossier (CSV global, agrégats), séparés par ';', ne sont pas modifiés
     """
     
     nh_folder = Path(nh_folder)
-    csv_files = [f for f in nh_folder.iterdir() if f.suffix.lower() == '.csv']
+    csv_files = [f for f in nh_folder.iterdir()
+                 if f.suffix.lower() == '.csv' and f.name.startswith('gallica_data_')]
 
     for file in csv_files:
         with open(file, "r", encoding="utf-8") as f:
@@ -217,7 +234,23 @@ def clean_csv(nh_folder: str | Path) -> None:
 
     print("Nettoyage terminé : tous les ';' ont été remplacés par ':'")
 
-def merge_csv(nh_folder: str | Path) -> None:
+def write_global(df: pd.DataFrame, nh_folder: str | Path) -> None:
+    """
+    Enregistre le DataFrame global dans le fichier CSV.
+
+    Paramètres :
+    - df : DataFrame au format du CSV global (une ligne par couple image / mot-clé)
+    - nh_folder : dossier contenant le fichier CSV global (str ou Path)
+
+    Effets :
+    - Écrase "mandragore_nh_global.csv" (séparateur ';')
+    """
+
+    df.to_csv(Path(nh_folder) / "mandragore_nh_global.csv", index=False, sep=";")
+
+def merge_csv(nh_folder: str | Path,
+              kw_file: str | Path | None = None,
+              from_db: bool = False) -> int:
     """
     Fusionne tous les fichiers CSV d'un dossier en un seul fichier, en ajoutant :
     - une colonne 'mot_cle' (dérivée du nom de fichier)
@@ -225,18 +258,35 @@ def merge_csv(nh_folder: str | Path) -> None:
 
     Paramètres :
     - nh_folder : dossier contenant les CSV d'entrée (str ou Path)
+    - kw_file : fichier de mots-clés de référence pour l'index (str ou Path, optionnel)
+    - from_db : ajoute aussi les lignes de la base "mandragore_nh.sqlite"
+      (pages enregistrées par le crawler avec db_path ; bool, défaut False)
+
+    Retour :
+    - Nombre de lignes du CSV global écrit (int)
 
     Effets :
     - Crée un fichier "mandragore_nh_global.csv" dans le dossier nh_folder
     - Écrit le CSV fusionné avec séparateur ';'
+    - Construit l'index inversé mots-clés → images dans "index_mots_cles"
+    - Si le crawler a enregistré ses statistiques ("statistiques_crawl.pkl"),
+      y recompte les paires de mots-clés à partir des mots-clés complets de chaque image
+
+    Règles :
+    - Tous les fichiers gallica_data_<mot-clé>.csv sont toujours fusionnés
+    - Avec from_db, un couple image / mot-clé présent à la fois dans un CSV et
+      dans la base n'est gardé qu'une fois (ligne du CSV)
     """
     
     nh_folder = Path(nh_folder)
     output_file =  nh_folder / "mandragore_nh_global.csv"
+    db_path = nh_folder / DB_FILE
+
     csv_list = []
 
     for file in nh_folder.iterdir():
-        if file.suffix.lower() != '.csv':
+        # seuls les exports du crawler (gallica_data_<mot-clé>.csv)
+        if file.suffix.lower() != '.csv' or not file.name.startswith('gallica_data_'):
             continue
         
         df = pd.read_csv(file, sep=',')
@@ -246,14 +296,65 @@ def merge_csv(nh_folder: str | Path) -> None:
 
         csv_list.append(df)
 
+    if from_db and db_path.exists():
+        conn = connect(db_path)
+        try:
+            csv_list.append(read_frame(conn)[MERGED_COLUMNS])
+        finally:
+            conn.close()
+
     # Concatène tous les DataFrames
     df_merged = pd.concat(csv_list, ignore_index=True)
+    if from_db:
+        df_merged = df_merged.drop_duplicates(subset=['ms_folio', 'caption', 'img_url', 'mot_cle'])
+        df_merged = df_merged.reset_index(drop=True)
 
     # Sauvegarde en un seul CSV
-    df_merged.to_csv(output_file, index=False, sep=';')
+    write_global(df_merged, nh_folder)
     print(f"Fichier fusionné créé : {output_file}")
 
-def fill_empty_cells(nh_folder: str | Path) -> None:
+    # Index inversé (les lignes du CSV global restent dans cet ordre par la suite)
+    build_keyword_index(df_merged, nh_folder, kw_file)
+
+    # Paires de mots-clés des statistiques de crawl, sur les images complètes
+    stats_path = nh_folder / STATS_FILE
+    if stats_path.exists():
+        stats = KeywordStats.load(stats_path)
+        images_keywords = df_merged.groupby(['ms_folio', 'caption', 'img_url'],
+                                            dropna=False)['mot_cle'].agg(list)
+        stats.rebuild_pairs(images_keywords)
+        stats.save(stats_path)
+        print(f"Paires de mots-clés recomptées dans : {stats_path.name}")
+
+    return len(df_merged)
+
+def save_database(nh_folder: str | Path) -> int:
+    """
+    Enregistre le CSV global nettoyé dans la base SQLite, en fin de pipeline.
+
+    Paramètres :
+    - nh_folder : dossier contenant le fichier CSV global (str ou Path)
+
+    Retour :
+    - Nombre de lignes du CSV global enregistrées (int)
+
+    Effets :
+    - Met à jour (upsert) les images et mots-clés dans "mandragore_nh.sqlite" ;
+      seules les images modifiées sont réécrites
+    """
+
+    nh_folder = Path(nh_folder)
+    df = pd.read_csv(nh_folder / "mandragore_nh_global.csv", sep=";")
+
+    conn = connect(nh_folder / DB_FILE)
+    try:
+        n = write_frame(conn, df)
+    finally:
+        conn.close()
+    print(f"{n} image(s) enregistrée(s) dans : {DB_FILE}")
+    return len(df)
+
+def fill_empty_cells(nh_folder: str | Path) -> int:
     """
     Lit le fichier CSV global et normalise les cellules vides.
     Réécrit le fichier sur place avec les valeurs par défaut.
@@ -261,6 +362,9 @@ def fill_empty_cells(nh_folder: str | Path) -> None:
     Paramètres :
     - nh_folder : dossier contenant le fichier CSV global (str ou Path)
 
+    Retour :
+    - Nombre de lignes du CSV global écrit (int)
+
     Effets :
     - Remplace les valeurs vides ou manquantes dans certaines colonnes
     - Affecte des valeurs par défaut (lieu, date, artiste)
@@ -289,13 +393,14 @@ def fill_empty_cells(nh_folder: str | Path) -> None:
             .fillna(fill_value)
         )
 
-    df.to_csv(csv, index=False, sep=";")
+    write_global(df, nh_folder)
     print(f"Fichier mis à jour : {csv}")
+    return len(df)
 
 def fix_dates(corrected_dates: dict[str, str],
               dates_to_clean: list[str],
               egyptian_dynasty: dict[str, str],
-              nh_folder: str | Path) -> None:
+              nh_folder: str | Path) -> int:
    """
     Nettoie et normalise la colonne 'date' du fichier CSV global.
     Réécrit le fichier sur place avec les dates corrigées.
@@ -306,6 +411,9 @@ def fix_dates(corrected_dates: dict[str, str],
     - egyptian_dynasty : dictionnaire des dynasties égyptiennes et de leurs périodes (dict)
     - nh_folder : dossier contenant le fichier CSV global (str ou Path)
 
+    Retour :
+    - Nombre de lignes du CSV global écrit (int)
+
     Effets :
     - Transforme les dynasties égyptiennes en "dynastie = période"
     - Remplace certaines dates imprécises à partir du manuscrit correspondant
@@ -331,8 +439,9 @@ def fix_dates(corrected_dates: dict[str, str],
 
    df.loc[mask_clean, "date"] = df.loc[mask_clean, "manuscrit"].map(corrected_dates)
 
-   df.to_csv(csv_path, index=False, sep=";")
+   write_global(df, nh_folder)
    print(f"Dates corrigées dans : {csv_path}")
+   return len(df)
 
    # return df
 
@@ -432,7 +541,7 @@ def extract_century(date_value: Any) -> str:
     # 7) Sinon, rien d'exploitable
     return "Date inconnue"
 
-def clean_century(nh_folder: str | Path) -> None:
+def clean_century(nh_folder: str | Path) -> int:
     """
     Ajoute une colonne 'siecle' calculée à partir de la colonne 'date',
     insérée immédiatement après celle-ci.
@@ -440,6 +549,9 @@ def clean_century(nh_folder: str | Path) -> None:
     Paramètres :
     - nh_folder : dossier contenant le fichier CSV Mandragore (str ou Path)
 
+    Retour :
+    - Nombre de lignes du CSV global écrit (int)
+
     Effets :
     - Calcule le siècle pour chaque ligne à partir de la colonne 'date'
     - Insère la colonne 'siecle' juste après la colonne 'date'
@@ -463,8 +575,9 @@ def clean_century(nh_folder: str | Path) -> None:
     # 4) Insérer juste après
     df.insert(date_idx + 1, "siecle", siecles)
 
-    df.to_csv(csv_path, index=False, sep=";")
+    write_global(df, nh_folder)
     print(f"Colonne 'siecle' ajoutée dans : {csv_path.name}")
+    return len(df)
     # return df
 
 def build_parent_country_map(lieux: Iterable[Any]) -> dict[str, str]:
@@ -586,7 +699,7 @@ def extract_country(lieux: Iterable[Any], parent_map: dict[str, str]) -> list[st
 
     return out
 
-def clean_places(nh_folder: str| Path) -> None:
+def clean_places(nh_folder: str| Path) -> int:
     """
     Lit le fichier CSV Mandragore et ajoute une colonne 'pays_region'
     extraite de la colonne 'lieu', insérée immédiatement après celle-ci.
@@ -594,6 +707,9 @@ def clean_places(nh_folder: str| Path) -> None:
     Paramètres :
     - nh_folder : dossier contenant le fichier CSV Mandragore (str ou Path)
 
+    Retour :
+    - Nombre de lignes du CSV global écrit (int)
+
     Effets :
     - Construit un référentiel interne lieu → pays/région
     - Calcule la colonne 'pays_region' à partir de la colonne 'lieu'
@@ -618,8 +734,9 @@ def clean_places(nh_folder: str| Path) -> None:
     df.insert(idx + 1, "pays_region", pays)
 
 
-    df.to_csv(csv_path, index=False, sep=";")
+    write_global(df, nh_folder)
     print(f"Colonne 'pays_region' ajoutée dans : {csv_path.name}")
+    return len(df)
     # return df
 
 
@@ -631,9 +748,22 @@ if __name__ == "__main__":
     if not nh_folder.exists():
         raise FileNotFoundError(f"Dossier introuvable : {nh_folder}")
     
-    clean_csv(nh_folder)
-    merge_csv(nh_folder)
-    fill_empty_cells(nh_folder)
-    fix_dates(corrected_dates, dates_to_clean, egyptian_dynasty, nh_folder)
-    clean_century(nh_folder)
-    clean_places(nh_folder)
\ No newline at end of file
+    # Profils cProfile optionnels (un fichier .prof par étape)
+    cprofile_dir = input("Dossier des profils cProfile (vide pour ignorer) : ").strip() or None
+    run_id = new_run_id()
+    stage = partial(profile_stage, nh_folder=nh_folder, run_id=run_id, cprofile_dir=cprofile_dir)
+
+    # chaque étape renvoie son nombre de lignes, qui devient l'entrée de la suivante
+    stage("clean_csv", clean_csv, nh_folder)
+    # lignes déjà comptées dans les agrégats, lues avant que merge_csv ne réécrive le CSV global
+    known_rows = counted_rows(nh_folder)
+    # les pages enregistrées par le crawler dans la base sont fusionnées avec les CSV
+    rows = stage("merge_csv", merge_csv, nh_folder, KW_FILE if KW_FILE.exists() else None,
+                 from_db=True)["rows_out"]
+    rows = stage("fill_empty_cells", fill_empty_cells, nh_folder, rows_in=rows)["rows_out"]
+    rows = stage("fix_dates", fix_dates, corrected_dates, dates_to_clean, egyptian_dynasty, nh_folder,
+                 rows_in=rows)["rows_out"]
+    rows = stage("clean_century", clean_century, nh_folder, rows_in=rows)["rows_out"]
+    rows = stage("clean_places", clean_places, nh_folder, rows_in=rows)["rows_out"]
+    rows = stage("save_database", save_database, nh_folder, rows_in=rows)["rows_out"]
+    stage("refresh_aggregates", refresh_aggregates, nh_folder, known_rows, rows_in=rows)
@@ -0,0 +1,213 @@
+from typing import Iterable, Callable
+from collections import Counter
+from itertools import combinations
+from math import comb
+import heapq
+import numpy as np
+
+from vocabulary import KeywordCSR
+
+
+
+# ---------------------------------------
+#     Ensembles fréquents de mots-clés
+# ---------------------------------------
+
+# Les cooccurrences sont extraites à la manière d'Apriori : un ensemble de
+# taille k ne peut être fréquent que si tous ses sous-ensembles de taille k-1
+# le sont. On ne compte donc, à chaque niveau, que les candidats issus du
+# niveau précédent, sans jamais matérialiser toutes les combinaisons d'un folio.
+
+
+def _frequent_singletons(folios: Callable[[], Iterable[Iterable[str]]],
+                         min_support: int) -> Counter:
+    """
+    Compte les mots-clés isolés sur l'ensemble des folios et ne garde que ceux
+    atteignant le support minimal.
+
+    Paramètres :
+    - folios : fonction renvoyant un nouvel itérable de folios (listes de mots-clés)
+    - min_support : nombre minimal de folios contenant le mot-clé (int)
+
+    Retour :
+    - Counter associant chaque mot-clé fréquent (tuple à 1 élément) à son support
+    """
+
+    counts = Counter()
+    for kws in folios():
+        for kw in set(kws):
+            counts[(kw,)] += 1
+
+    return Counter({k: c for k, c in counts.items() if c >= min_support})
+
+def _generate_candidates(frequent: Iterable[tuple[str, ...]]) -> set[tuple[str, ...]]:
+    """
+    Génère les candidats de taille k à partir des ensembles fréquents de taille k-1.
+
+    Paramètres :
+    - frequent : ensembles fréquents de taille k-1 (tuples triés)
+
+    Retour :
+    - Ensemble des candidats de taille k dont tous les sous-ensembles sont fréquents
+
+    Règles :
+    - Deux ensembles sont joints s'ils partagent leurs k-2 premiers éléments
+    - Un candidat est élagué dès qu'un de ses sous-ensembles n'est pas fréquent
+    """
+
+    frequent = sorted(frequent)
+    frequent_set = set(frequent)
+    candidates = set()
+
+    for i, a in enumerate(frequent):
+        for b in frequent[i + 1:]:
+            if a[:-1] != b[:-1]:
+                # liste triée : plus aucun préfixe commun possible
+                break
+            cand = a + (b[-1],)
+            if all(sub in frequent_set for sub in combinations(cand, len(cand) - 1)):
+                candidates.add(cand)
+
+    return candidates
+
+def _count_candidates(folios: Callable[[], Iterable[Iterable[str]]],
+                      candidates: set[tuple[str, ...]],
+                      items: set[str],
+                      size: int) -> Counter:
+    """
+    Compte le support des candidats en une seule passe sur les folios.
+
+    Paramètres :
+    - folios : fonction renvoyant un nouvel itérable de folios
+    - candidates : candidats de taille `size` (tuples triés)
+    - items : mots-clés apparaissant dans au moins un candidat
+    - size : taille des candidats (int)
+
+    Retour :
+    - Counter associant chaque candidat à son nombre de folios
+
+    Règles :
+    - Les mots-clés hors candidats sont retirés du folio avant tout calcul
+    - Si le folio réduit produit moins de combinaisons qu'il n'y a de candidats,
+      on parcourt ses combinaisons (générateur, sans liste intermédiaire)
+    - Sinon on teste chaque candidat par inclusion
+    """
+
+    counts = Counter()
+
+    for kws in folios():
+        seq = sorted(set(kws) & items)
+        if len(seq) < size:
+            continue
+
+        if comb(len(seq), size) <= len(candidates):
+            for c in combinations(seq, size):
+                if c in candidates:
+                    counts[c] += 1
+        else:
+            seq_set = set(seq)
+            for c in candidates:
+                if seq_set.issuperset(c):
+                    counts[c] += 1
+
+    return counts
+
+def _label(itemset: tuple, keywords: np.ndarray | None) -> str:
+    """
+    Construit le libellé d'un ensemble : mots-clés triés, joints par des espaces.
+
+    Paramètres :
+    - itemset : ensemble de mots-clés, ou d'identifiants si keywords est fourni (tuple)
+    - keywords : table identifiant -> mot-clé d'une KeywordCSR (optionnel)
+    """
+
+    if keywords is not None:
+        itemset = sorted(keywords[list(itemset)].tolist())
+    return " ".join(itemset)
+
+def _top(frequent: Counter,
+         top_k: int | None,
+         keywords: np.ndarray | None) -> list[tuple[str, int]]:
+    """
+    Sélectionne les ensembles les plus fréquents, libellés.
+    Les égalités sont départagées par le libellé décodé, quelle que soit l'entrée
+    (KeywordCSR ou listes de mots-clés).
+    """
+
+    labelled = [(_label(c, keywords), n) for c, n in frequent.items()]
+    key = lambda x: (-x[1], x[0])
+    if top_k is None:
+        return sorted(labelled, key=key)
+    return heapq.nsmallest(top_k, labelled, key=key)
+
+def _as_keywords(kws: Iterable[str]) -> list[str]:
+    """Mots-clés d'un folio (tout itérable sauf une chaîne ; [] pour None ou NaN)."""
+    if kws is None or isinstance(kws, float):
+        return []
+    if isinstance(kws, str):
+        raise TypeError(f"Un folio doit être un itérable de mots-clés, pas une chaîne : {kws!r}")
+    return list(kws)
+
+def frequent_keyword_sets(folios: KeywordCSR | Iterable[Iterable[str]] | Callable[[], Iterable[Iterable[str]]],
+                          min_n: int = 2,
+                          max_n: int = 5,
+                          min_support: int = 2,
+                          top_k: int | None = None) -> dict[int, list[tuple[str, int]]]:
+    """
+    Extrait les ensembles de mots-clés cooccurrents les plus fréquents par folio,
+    pour chaque taille de min_n à max_n.
+
+    Paramètres :
+    - folios : table CSR folio → mots-clés (KeywordCSR), listes de mots-clés par
+      folio (ex : df_cooc['kw'] ; tout itérable sauf une chaîne, valeurs
+      manquantes ignorées), ou fonction renvoyant un nouvel itérable à
+      chaque appel pour streamer depuis un fichier
+    - min_n : taille minimale des ensembles (int, défaut 2)
+    - max_n : taille maximale des ensembles (int, défaut 5)
+    - min_support : nombre minimal de folios pour qu'un ensemble soit retenu (int)
+    - top_k : nombre d'ensembles à conserver par taille (int, None pour tous)
+
+    Retour :
+    - Dictionnaire taille -> liste [(ensemble joint par des espaces, fréquence)],
+      triée par fréquence décroissante, directement utilisable par plot_most_common
+
+    Règles :
+    - Une passe sur les folios par taille, sans matérialiser les combinaisons
+    - Les libellés reprennent le format de ngrams_combinations (mots triés, joints par ' ')
+    - À fréquence égale, les ensembles sont classés par libellé
+    """
+
+    keywords = None
+    if isinstance(folios, KeywordCSR):
+        # Table CSR : on travaille sur les identifiants entiers, décodés à la fin
+        csr, keywords = folios, folios.keywords
+        source = lambda: (csr.folio_ids(i).tolist() for i in range(len(csr.folios)))
+    elif callable(folios):
+        source = folios
+    else:
+        # Un itérable simple n'est parcouru qu'une fois : on le fige en listes de mots-clés
+        cached = [_as_keywords(kws) for kws in folios]
+        source = lambda: cached
+
+    results = {}
+    frequent = _frequent_singletons(source, min_support)
+
+    if min_n <= 1:
+        results[1] = _top(frequent, top_k, keywords)
+
+    for size in range(2, max_n + 1):
+        if not frequent:
+            break
+
+        candidates = _generate_candidates(frequent)
+        if not candidates:
+            break
+
+        items = {kw for cand in candidates for kw in cand}
+        counts = _count_candidates(source, candidates, items, size)
+        frequent = Counter({c: n for c, n in counts.items() if n >= min_support})
+
+        if size >= min_n:
+            results[size] = _top(frequent, top_k, keywords)
+
+    return results
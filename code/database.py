@@ -0,0 +1,440 @@
+from typing import Any, Iterable
+from pathlib import Path
+import sqlite3
+import re
+import pandas as pd
+
+
+
+# ---------------------------------------
+#         Base SQLite Mandragore
+# ---------------------------------------
+
+# Tables normalisées :
+# - manuscripts : un manuscrit par ligne
+# - images : une image (ms_folio, caption, img_url) et ses métadonnées
+# - keywords : un mot-clé par ligne
+# - image_keywords : liens image / mot-clé
+# Le crawler y écrit page par page, le pipeline de nettoyage y enregistre son
+# résultat final, et le notebook l'interroge par index plutôt que de relire les CSV.
+
+DB_FILE = "mandragore_nh.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manuscripts (
+    id          INTEGER PRIMARY KEY,
+    manuscrit   TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS images (
+    id            INTEGER PRIMARY KEY,
+    manuscript_id INTEGER NOT NULL REFERENCES manuscripts(id),
+    img_url       TEXT NOT NULL DEFAULT '',
+    folio         TEXT,
+    ms_folio      TEXT NOT NULL DEFAULT '',
+    caption       TEXT NOT NULL DEFAULT '',
+    texte         TEXT,
+    artiste       TEXT,
+    lieu          TEXT,
+    pays_region   TEXT,
+    date          TEXT,
+    siecle        TEXT,
+    UNIQUE (ms_folio, caption, img_url)
+);
+
+CREATE TABLE IF NOT EXISTS keywords (
+    id       INTEGER PRIMARY KEY,
+    mot_cle  TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS image_keywords (
+    image_id    INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    keyword_id  INTEGER NOT NULL REFERENCES keywords(id),
+    PRIMARY KEY (image_id, keyword_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_images_manuscript   ON images(manuscript_id);
+CREATE INDEX IF NOT EXISTS idx_images_ms_folio     ON images(ms_folio);
+CREATE INDEX IF NOT EXISTS idx_images_siecle       ON images(siecle);
+CREATE INDEX IF NOT EXISTS idx_images_pays_region  ON images(pays_region);
+CREATE INDEX IF NOT EXISTS idx_image_keywords_kw   ON image_keywords(keyword_id, image_id);
+"""
+
+# Recherche plein texte sur la légende et le texte enluminé : index FTS5 adossé
+# à la table images (sans copie du texte), insensible aux accents, avec index
+# de préfixes. Les déclencheurs le tiennent à jour à chaque upsert du crawler.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(
+    caption, texte,
+    content = 'images', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+);
+
+CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN
+    INSERT INTO images_fts (rowid, caption, texte) VALUES (new.id, new.caption, new.texte);
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN
+    INSERT INTO images_fts (images_fts, rowid, caption, texte)
+    VALUES ('delete', old.id, old.caption, old.texte);
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_fts_update AFTER UPDATE OF caption, texte ON images
+WHEN old.caption IS NOT new.caption OR old.texte IS NOT new.texte BEGIN
+    INSERT INTO images_fts (images_fts, rowid, caption, texte)
+    VALUES ('delete', old.id, old.caption, old.texte);
+    INSERT INTO images_fts (rowid, caption, texte) VALUES (new.id, new.caption, new.texte);
+END;
+"""
+
+# Version du schéma (PRAGMA user_version) : le schéma n'est créé ou migré que
+# par la première connexion qui trouve une version plus ancienne, les autres
+# (ex : processus de crawl parallèles) n'exécutent aucun DDL.
+# 1 : tables et index ; 2 : index plein texte, déclencheur de mise à jour avec WHEN
+SCHEMA_VERSION = 2
+
+RE_WORD = re.compile(r"\w+")
+
+# Colonnes du fichier "mandragore_nh_global.csv", dans l'ordre
+GLOBAL_COLUMNS = ['img_url', 'manuscrit', 'folio', 'caption', 'texte', 'artiste',
+                  'lieu', 'pays_region', 'date', 'siecle', 'mot_cle', 'ms_folio']
+
+# Colonnes identifiant une image (NOT NULL : '' pour une valeur manquante)
+IMAGE_KEY = ['ms_folio', 'caption', 'img_url']
+IMAGE_FIELDS = ['folio', 'texte', 'artiste', 'lieu', 'pays_region', 'date', 'siecle']
+
+
+def connect(db_path: str | Path) -> sqlite3.Connection:
+    """
+    Ouvre (et crée si besoin) la base SQLite avec son schéma et ses index.
+
+    Paramètres :
+    - db_path : chemin du fichier SQLite (str ou Path)
+
+    Retour :
+    - Connexion SQLite (sqlite3.Connection)
+    """
+
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        _migrate(conn)
+
+    return conn
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """
+    Crée le schéma, ou met à jour celui d'une base plus ancienne, en une transaction.
+    """
+
+    # BEGIN IMMEDIATE : une seule connexion migre, les autres attendent puis revérifient
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            conn.rollback()
+            return
+
+        has_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'images_fts'"
+        ).fetchone()
+        for statement in _statements(SCHEMA):
+            conn.execute(statement)
+        # déclencheur d'une base antérieure, sans la clause WHEN
+        conn.execute("DROP TRIGGER IF EXISTS images_fts_update")
+        for statement in _statements(FTS_SCHEMA):
+            conn.execute(statement)
+        # base créée avant l'index plein texte : on l'indexe une fois
+        if not has_fts:
+            conn.execute("INSERT INTO images_fts (images_fts) VALUES ('rebuild')")
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def _statements(script: str) -> list[str]:
+    """Découpe un script SQL en instructions complètes (déclencheurs compris)."""
+    statements, current = [], ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    return statements
+
+def _ids(conn: sqlite3.Connection, table: str, column: str, values: Iterable[str]) -> dict[str, int]:
+    """
+    Insère les valeurs absentes d'une table de référence (manuscrits, mots-clés)
+    et renvoie leurs identifiants.
+    """
+
+    values = list(dict.fromkeys(values))
+    conn.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+                     [(v,) for v in values])
+
+    ids = {}
+    for i in range(0, len(values), 500):
+        chunk = values[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        ids.update(conn.execute(
+            f"SELECT {column}, id FROM {table} WHERE {column} IN ({placeholders})", chunk
+        ).fetchall())
+
+    return ids
+
+def _image_ids(conn: sqlite3.Connection, keys: pd.DataFrame) -> dict[tuple[str, str, str], int]:
+    """
+    Renvoie les identifiants des images (ms_folio, caption, img_url) données,
+    en une jointure sur l'index unique plutôt qu'une requête par image.
+    """
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS image_keys "
+                 "(ms_folio TEXT, caption TEXT, img_url TEXT)")
+    conn.execute("DELETE FROM image_keys")
+    conn.executemany("INSERT INTO image_keys VALUES (?, ?, ?)",
+                     zip(*(keys[c].tolist() for c in IMAGE_KEY)))
+
+    rows = conn.execute(
+        "SELECT k.ms_folio, k.caption, k.img_url, i.id FROM image_keys k "
+        "JOIN images i ON i.ms_folio = k.ms_folio AND i.caption = k.caption "
+        "AND i.img_url = k.img_url"
+    )
+    return {(ms_folio, caption, img_url): id_ for ms_folio, caption, img_url, id_ in rows}
+
+def write_frame(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """
+    Insère ou met à jour (upsert) des lignes au format du CSV global :
+    une ligne par couple image / mot-clé.
+
+    Paramètres :
+    - conn : connexion SQLite (voir connect)
+    - df : DataFrame avec au moins 'img_url', 'manuscrit', 'folio', 'caption',
+      'mot_cle' ; 'ms_folio' est calculée si absente
+
+    Retour :
+    - Nombre d'images écrites (int)
+
+    Règles :
+    - Une image est identifiée par (ms_folio, caption, img_url)
+    - Les champs présents dans df remplacent ceux de la base ; les colonnes
+      absentes de df (ex : 'siecle' avant clean_century) sont conservées
+    - Une image dont aucun champ ne change n'est pas réécrite (ni réindexée)
+    """
+
+    df = df.copy()
+    if 'ms_folio' not in df.columns:
+        df['ms_folio'] = df.manuscrit + ':' + df.folio
+    for col in IMAGE_KEY + ['manuscrit']:
+        df[col] = df[col].fillna('').astype(str)
+
+    fields = [c for c in IMAGE_FIELDS if c in df.columns]
+    columns = ['manuscript_id'] + IMAGE_KEY + fields
+    updated = ['manuscript_id'] + fields
+    updates = ", ".join(f"{c} = excluded.{c}" for c in updated)
+    changed = " OR ".join(f"images.{c} IS NOT excluded.{c}" for c in updated)
+    sql = (
+        f"INSERT INTO images ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (ms_folio, caption, img_url) DO UPDATE SET {updates} "
+        f"WHERE {changed}"
+    )
+
+    with conn:
+        ms_ids = _ids(conn, "manuscripts", "manuscrit", df['manuscrit'])
+
+        images = df.drop_duplicates(subset=IMAGE_KEY)
+        values = images[fields].astype(object)
+        values = values.where(values.notna(), None)
+        conn.executemany(sql, zip(images['manuscrit'].map(ms_ids).tolist(),
+                                  *(images[c].tolist() for c in IMAGE_KEY),
+                                  *(values[c].tolist() for c in fields)))
+
+        if 'mot_cle' in df.columns:
+            image_ids = _image_ids(conn, images)
+            links = df.dropna(subset=['mot_cle'])
+            kw_ids = _ids(conn, "keywords", "mot_cle", links['mot_cle'].astype(str))
+            keys = zip(*(links[c].tolist() for c in IMAGE_KEY))
+            conn.executemany(
+                "INSERT OR IGNORE INTO image_keywords (image_id, keyword_id) VALUES (?, ?)",
+                [(image_ids[k], kw_ids[kw])
+                 for k, kw in zip(keys, links['mot_cle'].astype(str).tolist())]
+            )
+
+    return len(images)
+
+def _scraped_frame(rows: list[list[str]]) -> pd.DataFrame:
+    """
+    Lignes extraites par retrieve_img_data, au format du CSV global.
+    Les ';' sont remplacés par ':' comme le fait clean_csv sur les exports du
+    crawler : une image garde la même clé (ms_folio, caption, img_url) qu'elle
+    vienne du crawler ou du pipeline de nettoyage.
+    """
+
+    columns = ['img_url', 'manuscrit', 'folio', 'caption', 'texte', 'artiste', 'lieu', 'date']
+    df = pd.DataFrame(rows, columns=columns)
+    for col in columns:
+        df[col] = df[col].str.replace(';', ':', regex=False)
+    return df
+
+def upsert_scraped_rows(db_path: str | Path, rows: list[list[str]], mot_cle: str) -> int:
+    """
+    Enregistre dans la base les lignes extraites par retrieve_img_data pour un mot-clé.
+
+    Paramètres :
+    - db_path : chemin du fichier SQLite (str ou Path)
+    - rows : lignes [img_url, manuscrit, folio, légende, texte enluminé, artiste, lieu, date]
+    - mot_cle : mot-clé de la recherche (str)
+
+    Retour :
+    - Nombre d'images insérées ou mises à jour (int)
+    """
+
+    df = _scraped_frame(rows)
+    df['mot_cle'] = mot_cle
+
+    conn = connect(db_path)
+    try:
+        return write_frame(conn, df)
+    finally:
+        conn.close()
+
+def image_keywords(db_path: str | Path, rows: list[list[str]]) -> list[set[str]]:
+    """
+    Renvoie les mots-clés déjà associés dans la base à l'image de chaque ligne
+    extraite par retrieve_img_data (ex : pour compter les paires de mots-clés
+    pendant le crawl, voir sketches.KeywordStats).
+
+    Paramètres :
+    - db_path : chemin du fichier SQLite (str ou Path)
+    - rows : lignes [img_url, manuscrit, folio, légende, texte enluminé, artiste, lieu, date]
+
+    Retour :
+    - Un ensemble de mots-clés par ligne, dans l'ordre des lignes
+      (vide pour une image absente de la base)
+    """
+
+    df = _scraped_frame(rows)
+    df['ms_folio'] = df.manuscrit + ':' + df.folio
+    for col in IMAGE_KEY:
+        df[col] = df[col].fillna('').astype(str)
+
+    conn = connect(db_path)
+    try:
+        image_ids = _image_ids(conn, df)
+        keywords: dict[int, set[str]] = {}
+        ids = list(set(image_ids.values()))
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for image_id, mot_cle in conn.execute(
+                f"SELECT ik.image_id, k.mot_cle FROM image_keywords ik "
+                f"JOIN keywords k ON k.id = ik.keyword_id "
+                f"WHERE ik.image_id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                keywords.setdefault(image_id, set()).add(mot_cle)
+    finally:
+        conn.close()
+
+    keys = zip(*(df[c].tolist() for c in IMAGE_KEY))
+    return [set(keywords.get(image_ids.get(key), ())) for key in keys]
+
+def read_frame(conn: sqlite3.Connection, **filters: Any) -> pd.DataFrame:
+    """
+    Relit la base au format du CSV global (une ligne par couple image / mot-clé),
+    en filtrant sur les colonnes indexées.
+
+    Paramètres :
+    - conn : connexion SQLite (voir connect)
+    - filters : valeur ou liste de valeurs pour 'manuscrit', 'ms_folio',
+      'siecle', 'pays_region' ou 'mot_cle'
+
+    Retour :
+    - DataFrame aux colonnes de GLOBAL_COLUMNS
+
+    Exemple :
+    - read_frame(conn, siecle="XVe siècle", mot_cle=["abeille", "absinthe"])
+    """
+
+    columns = {
+        'manuscrit': 'm.manuscrit', 'ms_folio': 'i.ms_folio', 'siecle': 'i.siecle',
+        'pays_region': 'i.pays_region', 'mot_cle': 'k.mot_cle',
+    }
+
+    where, params = [], []
+    for col, value in filters.items():
+        if col not in columns:
+            raise ValueError(f"Filtre non indexé : '{col}'. Filtres disponibles: {list(columns)}")
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        where.append(f"{columns[col]} IN ({','.join('?' * len(values))})")
+        params.extend(values)
+
+    select = ", ".join(
+        "m.manuscrit" if c == 'manuscrit' else "k.mot_cle" if c == 'mot_cle' else f"i.{c}"
+        for c in GLOBAL_COLUMNS
+    )
+    sql = (
+        f"SELECT {select} FROM images i "
+        f"JOIN manuscripts m ON m.id = i.manuscript_id "
+        f"LEFT JOIN image_keywords ik ON ik.image_id = i.id "
+        f"LEFT JOIN keywords k ON k.id = ik.keyword_id"
+    )
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY i.id, k.id"
+
+    df = pd.read_sql_query(sql, conn, params=params)
+    # '' stocké pour une légende absente -> valeur manquante, comme dans le CSV
+    df['caption'] = df['caption'].replace('', pd.NA)
+    return df
+
+def search_images(conn: sqlite3.Connection,
+                  text: str,
+                  columns: Iterable[str] = ('caption', 'texte'),
+                  prefix: bool = True,
+                  limit: int | None = 50) -> pd.DataFrame:
+    """
+    Recherche plein texte dans les légendes et textes enluminés, sans tenir
+    compte des accents ni de la casse.
+
+    Paramètres :
+    - conn : connexion SQLite (voir connect)
+    - text : mots recherchés, tous requis (str), ex : "cerf fontaine"
+    - columns : colonnes interrogées, parmi 'caption' et 'texte' (ValueError si aucune)
+    - prefix : chaque mot est aussi cherché comme préfixe (bool, défaut True)
+    - limit : nombre maximal de résultats (int, None pour tous)
+
+    Retour :
+    - DataFrame des images trouvées, de la plus pertinente à la moins pertinente
+      (colonnes de la table images + 'manuscrit' + 'score')
+
+    Règles :
+    - "eveque" trouve "évêque" ; "evan" trouve "Évangile" si prefix=True
+    - Les mots sont cités un par un : la syntaxe FTS5 de l'utilisateur est ignorée
+    """
+
+    words = RE_WORD.findall(text)
+    if not words:
+        return pd.DataFrame()
+
+    columns = [c for c in columns if c in ('caption', 'texte')]
+    if not columns:
+        raise ValueError("Colonnes de recherche invalides. Colonnes disponibles: ['caption', 'texte']")
+    terms = " ".join(f'"{w}"' + ("*" if prefix else "") for w in words)
+    match = "{" + " ".join(columns) + "} : (" + terms + ")"
+
+    sql = (
+        "SELECT i.*, m.manuscrit, bm25(images_fts) AS score "
+        "FROM images_fts "
+        "JOIN images i ON i.id = images_fts.rowid "
+        "JOIN manuscripts m ON m.id = i.manuscript_id "
+        "WHERE images_fts MATCH ? "
+        "ORDER BY score"
+    )
+    params: list[Any] = [match]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    return pd.read_sql_query(sql, conn, params=params)
@@ -0,0 +1,267 @@
+from typing import Any, Iterable, Iterator
+from pathlib import Path
+import csv
+import hashlib
+import io
+import requests
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+
+
+# ---------------------------------------
+#   Téléchargement des images sans doublons
+# ---------------------------------------
+
+# Beaucoup d'img_url désignent la même enluminure (même folio sous plusieurs
+# identifiants IIIF, copies entre manuscrits). Pour chaque image, on télécharge
+# d'abord une vignette IIIF, on en calcule l'empreinte perceptuelle (pHash,
+# 64 bits), et on cherche une empreinte proche (distance de Hamming) dans un
+# BK-tree. Seules les images sans quasi-doublon sont téléchargées en pleine
+# résolution ; les autres sont rattachées à leur image canonique.
+
+DEDUP_FILE = "doublons_images.csv"
+DEDUP_COLUMNS = ["img_url", "phash", "canonical_url", "fichier"]
+UNAVAILABLE = "Image non disponible"
+
+
+def thumbnail_url(img_url: str, size: int = 64) -> str:
+    """
+    Construit l'URL IIIF d'une vignette à partir de l'URL pleine résolution.
+
+    Paramètres :
+    - img_url : URL IIIF de l'image (…/full/max/0/default.jpg)
+    - size : largeur de la vignette en pixels (int, défaut 64)
+
+    Retour :
+    - URL de la vignette (…/full/64,/0/default.jpg), ou img_url si le motif
+      IIIF n'est pas reconnu
+    """
+
+    return img_url.replace("/full/max/", f"/full/{size},/", 1)
+
+def fetch(url: str, session: requests.Session | None = None, timeout: float = 30) -> bytes | None:
+    """
+    Télécharge une ressource et renvoie son contenu.
+
+    Paramètres :
+    - url : adresse de la ressource (str)
+    - session : session requests à réutiliser (optionnel)
+    - timeout : délai maximal en secondes (float, défaut 30)
+
+    Retour :
+    - Contenu binaire, ou None en cas d'erreur réseau/HTTP
+    """
+
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+
+    except requests.exceptions.RequestException as e:
+        print(f"Erreur de requête pour l'URL: {url}\n→ {e}")
+        return None
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Matrice de la DCT-II orthonormée de taille n."""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+_DCT_32 = _dct_matrix(32)
+
+def phash(image_bytes: bytes) -> int:
+    """
+    Calcule l'empreinte perceptuelle (pHash) d'une image.
+
+    Paramètres :
+    - image_bytes : contenu de l'image (JPEG, PNG…)
+
+    Retour :
+    - Empreinte sur 64 bits (int)
+
+    Règles :
+    - Image en niveaux de gris réduite à 32×32, puis DCT 2D
+    - On garde les 8×8 basses fréquences ; chaque bit indique si le
+      coefficient dépasse leur médiane
+    """
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        pixels = np.asarray(img.convert("L").resize((32, 32), Image.Resampling.LANCZOS),
+                            dtype=np.float64)
+
+    dct = _DCT_32 @ pixels @ _DCT_32.T
+    low = dct[:8, :8].flatten()
+    bits = low > np.median(low)
+
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+def hamming(a: int, b: int) -> int:
+    """Distance de Hamming entre deux empreintes."""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Arbre BK sur les empreintes, pour retrouver les empreintes à une distance
+    de Hamming donnée sans les comparer toutes.
+    Chaque nœud est [empreinte, valeur, {distance: nœud enfant}].
+    """
+
+    def __init__(self) -> None:
+        self.root: list | None = None
+        self.size = 0
+
+    def add(self, h: int, value: Any) -> None:
+        """Ajoute une empreinte et la valeur associée (ex : URL canonique)."""
+        self.size += 1
+        if self.root is None:
+            self.root = [h, value, {}]
+            return
+
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, value, {}]
+                return
+            node = child
+
+    def search(self, h: int, max_distance: int) -> list[tuple[int, Any]]:
+        """
+        Renvoie les couples (distance, valeur) à une distance ≤ max_distance,
+        du plus proche au plus éloigné.
+        """
+
+        if self.root is None:
+            return []
+
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_distance:
+                found.append((d, node[1]))
+            # inégalité triangulaire : seuls ces enfants peuvent contenir un résultat
+            for dist, child in node[2].items():
+                if d - max_distance <= dist <= d + max_distance:
+                    stack.append(child)
+
+        return sorted(found, key=lambda x: x[0])
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def image_filename(img_url: str) -> str:
+    """Nom de fichier stable pour une image, dérivé de son URL."""
+    return hashlib.sha1(img_url.encode("utf-8")).hexdigest()[:16] + ".jpg"
+
+def _iter_urls(img_urls: Iterable[str]) -> Iterator[str]:
+    """URL distinctes et disponibles, dans l'ordre d'apparition."""
+    seen = set()
+    for url in img_urls:
+        if pd.isna(url) or url == UNAVAILABLE or url in seen:
+            continue
+        seen.add(url)
+        yield url
+
+def download_images(img_urls: Iterable[str],
+                    output_folder: str | Path,
+                    max_distance: int = 6,
+                    thumb_size: int = 64,
+                    session: requests.Session | None = None) -> pd.DataFrame:
+    """
+    Télécharge les images en pleine résolution en sautant les quasi-doublons.
+
+    Paramètres :
+    - img_urls : URL IIIF des images (ex : df.img_url)
+    - output_folder : dossier des images et du fichier des doublons (str ou Path)
+    - max_distance : distance de Hamming maximale entre deux quasi-doublons (int, défaut 6)
+    - thumb_size : largeur des vignettes utilisées pour l'empreinte (int, défaut 64)
+    - session : session requests à réutiliser (optionnel)
+
+    Retour :
+    - DataFrame img_url, phash, canonical_url, fichier (une ligne par URL traitée)
+
+    Effets :
+    - Enregistre les images canoniques dans output_folder
+    - Complète "doublons_images.csv" au fil du téléchargement (une ligne par
+      image traitée, écrite aussitôt : un arrêt en cours de route ne perd rien)
+
+    Règles :
+    - Les URL déjà présentes dans "doublons_images.csv" ne sont pas retraitées ;
+      leurs empreintes alimentent l'arbre BK au démarrage
+    - Une image dont la vignette est inaccessible n'est pas enregistrée
+    """
+
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    dedup_path = output_folder / DEDUP_FILE
+    session = session or requests.Session()
+
+    # --- 1) Reprise : empreintes déjà calculées ---
+    tree = BKTree()
+    # un fichier vide (arrêt avant l'écriture de l'en-tête) ne contient aucun enregistrement
+    if dedup_path.exists() and dedup_path.stat().st_size > 0:
+        done = pd.read_csv(dedup_path, sep=";", dtype=str)
+        for row in done.itertuples(index=False):
+            if row.img_url == row.canonical_url:
+                tree.add(int(row.phash, 16), row.img_url)
+    else:
+        done = pd.DataFrame(columns=DEDUP_COLUMNS)
+    known = set(done.img_url)
+
+    records = []
+    skipped = 0
+    with open(dedup_path, "a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        if f.tell() == 0:
+            writer.writerow(DEDUP_COLUMNS)
+            f.flush()
+
+        for url in _iter_urls(img_urls):
+            if url in known:
+                continue
+
+            # --- 2) Vignette et empreinte ---
+            thumb = fetch(thumbnail_url(url, thumb_size), session)
+            if thumb is None:
+                continue
+            try:
+                h = phash(thumb)
+            except OSError as e:
+                print(f"⚠️ Vignette illisible pour {url} : {e}")
+                continue
+
+            # --- 3) Quasi-doublon : rattachement à l'image canonique ---
+            matches = tree.search(h, max_distance)
+            if matches:
+                canonical = matches[0][1]
+                skipped += 1
+            else:
+                # --- 4) Nouvelle image : téléchargement pleine résolution ---
+                content = fetch(url, session)
+                if content is None:
+                    continue
+                canonical = url
+                (output_folder / image_filename(url)).write_bytes(content)
+                tree.add(h, url)
+
+            # --- 5) Enregistrement immédiat (reprise possible après un arrêt) ---
+            row = [url, f"{h:016x}", canonical, image_filename(canonical)]
+            writer.writerow(row)
+            f.flush()
+            records.append(row)
+
+    new = pd.DataFrame(records, columns=DEDUP_COLUMNS)
+    result = pd.concat([done, new], ignore_index=True) if len(done) else new
+
+    print(f"✅ {len(new) - skipped} image(s) téléchargée(s), "
+          f"{skipped} quasi-doublon(s) rattaché(s) : {dedup_path}")
+    return result
@@ -0,0 +1,212 @@
+from typing import Iterable, NamedTuple
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from vocabulary import read_vocabulary, write_vocabulary, extend_vocabulary
+
+
+
+# ---------------------------------------
+#      Index inversé mots-clés → images
+# ---------------------------------------
+
+# Une image est identifiée par le couple (ms_folio, caption), comme dans
+# export_mots_cles_groupes. Pour chaque mot-clé, on stocke la liste triée
+# des identifiants d'images (int32) dans un unique tableau `postings`,
+# découpé par `offsets` : les images du mot-clé i sont
+# postings[offsets[i]:offsets[i + 1]]. Les tableaux sont non compressés
+# pour pouvoir être ouverts en mmap et lus sans décodage.
+
+INDEX_DIR = "index_mots_cles"
+VOCAB_FILE = "vocabulaire.txt"
+OFFSETS_FILE = "offsets.npy"
+POSTINGS_FILE = "postings.npy"
+ROWS_FILE = "lignes.npy"
+
+
+class KeywordIndex(NamedTuple):
+    vocabulary: dict[str, int]  # mot-clé -> identifiant
+    offsets: np.ndarray         # int64, taille len(vocabulary) + 1
+    postings: np.ndarray        # int32, identifiants d'images triés par mot-clé
+    rows: np.ndarray            # int64, identifiant d'image -> ligne du CSV global
+
+
+def build_keyword_index(df: pd.DataFrame,
+                        nh_folder: str | Path,
+                        kw_file: str | Path | None = None) -> Path:
+    """
+    Construit l'index inversé mots-clés → images à partir du DataFrame fusionné
+    et l'écrit sur disque.
+
+    Paramètres :
+    - df : DataFrame fusionné (colonnes 'mot_cle', 'ms_folio', 'caption'), dans
+      l'ordre des lignes du fichier "mandragore_nh_global.csv"
+    - nh_folder : dossier dans lequel créer le sous-dossier de l'index (str ou Path)
+    - kw_file : fichier de mots-clés de référence fixant l'ordre des identifiants
+      (str ou Path, optionnel)
+
+    Retour :
+    - Chemin du dossier de l'index (Path)
+
+    Effets :
+    - Crée le dossier "index_mots_cles" avec le vocabulaire et les tableaux .npy
+
+    Règles :
+    - Les identifiants suivent l'ordre de kw_file ; les mots-clés absents du
+      fichier sont ajoutés à la suite, triés
+    - Chaque image pointe vers sa première ligne dans le CSV global
+    """
+
+    index_dir = Path(nh_folder) / INDEX_DIR
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    # --- 1) Vocabulaire ---
+    vocabulary = read_vocabulary(kw_file) if kw_file else []
+    kw_ids = extend_vocabulary(vocabulary, df["mot_cle"].dropna().unique())
+
+    # --- 2) Identifiants d'images (ms_folio, caption) ---
+    image_ids, _ = pd.factorize(
+        pd.MultiIndex.from_arrays([df["ms_folio"], df["caption"]])
+    )
+    image_ids = image_ids.astype(np.int64)
+    n_images = int(image_ids.max()) + 1 if len(image_ids) else 0
+
+    valid = image_ids >= 0
+    rows = np.full(n_images, -1, dtype=np.int64)
+    # parcours à l'envers : la dernière écriture est la première ligne
+    rows[image_ids[valid][::-1]] = np.flatnonzero(valid)[::-1]
+
+    # --- 3) Listes d'images par mot-clé, triées et sans doublons ---
+    mask = df["mot_cle"].notna().to_numpy() & valid
+    kw_col = df["mot_cle"].to_numpy()[mask].astype(str)
+    pairs = np.unique(np.stack([
+        np.array([kw_ids[kw] for kw in kw_col], dtype=np.int64),
+        image_ids[mask],
+    ], axis=1), axis=0)
+
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=len(vocabulary)), out=offsets[1:])
+    postings = pairs[:, 1].astype(np.int32)
+
+    # --- 4) Écriture ---
+    write_vocabulary(vocabulary, index_dir / VOCAB_FILE)
+    np.save(index_dir / OFFSETS_FILE, offsets)
+    np.save(index_dir / POSTINGS_FILE, postings)
+    np.save(index_dir / ROWS_FILE, rows)
+
+    print(f"Index des mots-clés créé : {index_dir} "
+          f"({len(vocabulary)} mots-clés, {n_images} images)")
+    return index_dir
+
+def load_keyword_index(nh_folder: str | Path) -> KeywordIndex:
+    """
+    Charge l'index inversé en mémoire partagée (mmap), sans lire les tableaux.
+
+    Paramètres :
+    - nh_folder : dossier contenant le sous-dossier "index_mots_cles" (str ou Path)
+
+    Retour :
+    - KeywordIndex prêt à être interrogé
+    """
+
+    index_dir = Path(nh_folder) / INDEX_DIR
+    if not index_dir.exists():
+        raise FileNotFoundError(f"Index introuvable : {index_dir}")
+
+    vocabulary = read_vocabulary(index_dir / VOCAB_FILE)
+
+    return KeywordIndex(
+        vocabulary={kw: i for i, kw in enumerate(vocabulary)},
+        offsets=np.load(index_dir / OFFSETS_FILE, mmap_mode='r'),
+        postings=np.load(index_dir / POSTINGS_FILE, mmap_mode='r'),
+        rows=np.load(index_dir / ROWS_FILE, mmap_mode='r'),
+    )
+
+def images_for(index: KeywordIndex, kw: str) -> np.ndarray:
+    """
+    Renvoie les identifiants d'images associés à un mot-clé.
+
+    Paramètres :
+    - index : index chargé (KeywordIndex)
+    - kw : mot-clé (str)
+
+    Retour :
+    - Tableau trié des identifiants d'images (vide si le mot-clé est inconnu)
+    """
+
+    kw_id = index.vocabulary.get(kw)
+    if kw_id is None:
+        return np.empty(0, dtype=np.int32)
+    return index.postings[index.offsets[kw_id]:index.offsets[kw_id + 1]]
+
+def query_index(index: KeywordIndex,
+                all_of: Iterable[str] = (),
+                any_of: Iterable[str] = (),
+                none_of: Iterable[str] = ()) -> np.ndarray:
+    """
+    Interroge l'index avec une requête booléenne.
+
+    Paramètres :
+    - index : index chargé (KeywordIndex)
+    - all_of : mots-clés tous présents (ET)
+    - any_of : au moins un de ces mots-clés présent (OU)
+    - none_of : aucun de ces mots-clés présent (SAUF)
+
+    Retour :
+    - Tableau trié des identifiants d'images satisfaisant la requête
+
+    Règles :
+    - Les intersections commencent par la liste la plus courte
+    - Sans critère ET ni OU, la requête porte sur toutes les images
+    """
+
+    all_of, any_of, none_of = list(all_of), list(any_of), list(none_of)
+    result = None
+
+    if all_of:
+        lists = sorted((images_for(index, kw) for kw in all_of), key=len)
+        result = np.asarray(lists[0])
+        for ids in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, ids, assume_unique=True)
+
+    if any_of:
+        union = np.unique(np.concatenate([images_for(index, kw) for kw in any_of]))
+        result = union if result is None else np.intersect1d(result, union, assume_unique=True)
+
+    if result is None:
+        result = np.arange(len(index.rows), dtype=np.int32)
+
+    for kw in none_of:
+        if not len(result):
+            break
+        result = np.setdiff1d(result, images_for(index, kw), assume_unique=True)
+
+    return result
+
+def count_query(index: KeywordIndex, **query: Iterable[str]) -> int:
+    """
+    Compte les images satisfaisant une requête booléenne (voir query_index).
+
+    Retour :
+    - Nombre d'images (int)
+    """
+
+    return int(len(query_index(index, **query)))
+
+def rows_for(index: KeywordIndex, image_ids: np.ndarray) -> np.ndarray:
+    """
+    Convertit des identifiants d'images en numéros de lignes du CSV global,
+    utilisables avec df.iloc pour retrouver les métadonnées.
+
+    Paramètres :
+    - index : index chargé (KeywordIndex)
+    - image_ids : identifiants d'images (np.ndarray)
+
+    Retour :
+    - Numéros de lignes dans "mandragore_nh_global.csv" (np.ndarray)
+    """
+
+    return np.asarray(index.rows[np.asarray(image_ids, dtype=np.int64)])
@@ -0,0 +1,202 @@
+from collections import Counter
+import textwrap
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from vocabulary import KeywordCSR
+
+
+
+# ---------------------------------------
+#       Graphiques du notebook d'analyse
+# ---------------------------------------
+
+def plot_top_captions(df=None, top_n=20, figsize=(12, 10), savepath=None, dpi=300, counts=None, show=True):
+    """
+    Visualise les captions les plus fréquentes dans le dataframe.
+    
+    Parameters:
+    -----------
+    df : DataFrame, optional
+        DataFrame contenant la colonne 'caption' (si counts n'est pas fourni)
+    top_n : int
+        Nombre de captions à afficher
+    figsize : tuple
+        Dimensions de la figure (largeur, hauteur)
+    savepath : str, optional
+        Chemin pour sauvegarder la figure (sans extension)
+    dpi : int
+        Résolution pour la sauvegarde
+    counts : Series, optional
+        Comptages précalculés par caption (sortie de query_counts)
+    show : bool
+        Affiche la figure (False pour un rendu sans affichage)
+    """
+    # Extraction des données (comptages précalculés si disponibles)
+    if counts is not None:
+        top = [(str(l), int(c)) for l, c in counts.head(top_n).items()]
+        total = int(counts.sum())
+    else:
+        top = Counter(df.caption.astype(str)).most_common(top_n)
+        total = len(df)
+    labels = [textwrap.fill(l.strip(), 35) for l, _ in top]
+    counts = [c for _, c in top]
+    
+    # Création de la figure
+    fig, ax = plt.subplots(figsize=figsize)
+    
+    # Palette de couleurs académique
+    palette = sns.color_palette('viridis', n_colors=len(labels))
+    # Alternatives : 'mako_r', 'rocket_r', 'crest'
+    
+    # Création du barplot horizontal
+    bars = ax.barh(
+        labels, 
+        counts, 
+        color=palette,
+        edgecolor='black',
+        linewidth=0.5
+    )
+    
+    # Amélioration du titre et des labels
+    ax.set_title(
+        f'Les {top_n} captions les plus fréquentes',
+        fontsize=14,
+        fontweight='bold',
+        pad=20
+    )
+    ax.set_xlabel('Nombre d\'occurrences', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Captions', fontsize=12, fontweight='bold')
+    
+    # Ajout des valeurs sur les barres (nombre + pourcentage)
+    for i, count in enumerate(counts):
+        pct = count / total * 100
+        ax.text(
+            count, i, 
+            f' {count} ({pct:.1f}%)', 
+            va='center', 
+            ha='left', 
+            fontsize=9
+        )
+    
+    # Amélioration de la lisibilité
+    ax.tick_params(axis='both', labelsize=10)
+    ax.invert_yaxis()  # Les plus fréquentes en haut
+    
+    # Grille légère pour faciliter la lecture
+    ax.grid(axis='x', alpha=0.3, linestyle='--', linewidth=0.5)
+    ax.set_axisbelow(True)
+    
+    fig.tight_layout()
+    
+    # Sauvegarde si demandée
+    if savepath:
+        fig.savefig(
+            f'{savepath}.png', 
+            dpi=dpi, 
+            bbox_inches='tight', 
+            facecolor='white', 
+            edgecolor='none'
+        )
+    
+    if show:
+        plt.show()
+    
+    return fig, ax
+
+def plot_most_common(df, top_cooc, n_top, ngram_size=3, figsize=(12, 8), save_path=None, dpi=300, kw_column='kw', show=True):
+    """
+    Visualise les n cooccurrences les plus fréquentes par folio.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame or KeywordCSR
+        DataFrame contenant les données, ou table CSR folio → mots-clés
+    top_cooc : dict
+        Cooccurrences fréquentes par taille, issues de frequent_keyword_sets
+    n_top : int
+        Nombre de cooccurrences à afficher
+    ngram_size : int
+        Taille des n-grams à analyser (2 pour bigrams, 3 pour trigrams, etc.)
+    figsize : tuple
+        Dimensions de la figure (largeur, hauteur)
+    save_path : str, optional
+        Chemin pour sauvegarder la figure
+    dpi : int
+        Résolution pour la sauvegarde
+    kw_column : str
+        Colonne contenant les listes de mots-clés par folio
+    show : bool
+        Affiche la figure (False pour un rendu sans affichage)
+    """
+    # Vérification que la taille a bien été extraite
+    if ngram_size not in top_cooc:
+        raise ValueError(f"Aucune cooccurrence de taille {ngram_size} n'a été extraite. "
+                        f"Tailles disponibles: {sorted(top_cooc)}")
+    
+    # Extraction des données
+    top = top_cooc[ngram_size][:n_top]
+    labels = [i[0].strip() for i in top]
+    counts = [i[1] for i in top]
+    
+    # Création de la figure
+    fig, ax = plt.subplots(figsize=figsize)
+    
+    
+    palette = sns.color_palette('viridis', n_colors=len(labels))
+    
+    
+    # Création du barplot
+    sns.barplot(
+        y=labels, 
+        x=counts, 
+        palette=palette,
+        
+        ax=ax,
+        edgecolor='black',
+        linewidth=0.5
+    )
+    
+    # Amélioration du nom des n-grams
+    ngram_names = {2: 'bigrammes', 3: 'trigrammes', 4: '4-grammes', 5: '5-grammes'}
+    ngram_label = ngram_names.get(ngram_size, f'{ngram_size}-grammes')
+    
+    
+    ax.set_title(
+        f'Les {n_top} cooccurrences les plus fréquentes par folio ({ngram_label})',
+        fontsize=14,
+        fontweight='bold',
+        pad=20
+    )
+    ax.set_xlabel('Fréquence', fontsize=12, fontweight='bold')
+    ax.set_ylabel(f'Cooccurrences ({ngram_label})', fontsize=12, fontweight='bold')
+    
+    # Ajout des valeurs sur les barres avec pourcentages (pas sûr pour les pourcentages)
+    lengths = df.lengths() if isinstance(df, KeywordCSR) else df[kw_column].str.len()
+    total = (lengths >= ngram_size).sum()
+    for i, count in enumerate(counts):
+        pct = count / total * 100
+        ax.text(
+            count, i, 
+            f' {count} ({pct:.1f}%)', 
+            va='center', 
+            ha='left', 
+            fontsize=9
+        )
+    
+    ax.tick_params(axis='both', labelsize=10)
+    fig.tight_layout()
+
+    
+    ax.grid(axis='x', alpha=0.3, linestyle='--', linewidth=0.5)
+    ax.set_axisbelow(True)
+    
+    # Sauvegarde 
+    if save_path:
+        fig.savefig(save_path, dpi=dpi, bbox_inches='tight', 
+                    facecolor='white', edgecolor='none')
+    
+    if show:
+        plt.show()
+    
+    return fig, ax
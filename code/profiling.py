@@ -0,0 +1,137 @@
+from typing import Any, Callable
+from datetime import datetime
+from pathlib import Path
+import cProfile
+import json
+import time
+import tracemalloc
+import pandas as pd
+
+
+
+# ---------------------------------------
+#     Profilage des étapes de nettoyage
+# ---------------------------------------
+
+# Chaque étape de clean_files.py est exécutée via profile_stage, qui mesure :
+# - le temps réel et le temps CPU
+# - le pic mémoire Python (tracemalloc)
+# - le nombre de lignes en entrée / en sortie de l'étape (renvoyé par l'étape,
+#   sans relire le CSV global)
+# et ajoute une ligne JSON par étape au rapport "profilage_runs.jsonl".
+# Le rapport est écrit étape par étape : si le processus est tué (OOM),
+# les étapes déjà terminées y figurent, et l'étape fautive est la suivante.
+
+REPORT_FILE = "profilage_runs.jsonl"
+
+
+def new_run_id() -> str:
+    """Identifiant d'exécution, horodaté (ex : "20261019-142501")."""
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+def profile_stage(name: str,
+                  func: Callable[..., Any],
+                  *args: Any,
+                  nh_folder: str | Path,
+                  rows_in: int | None = None,
+                  run_id: str | None = None,
+                  cprofile_dir: str | Path | None = None,
+                  trace_memory: bool = True,
+                  **kwargs: Any) -> dict[str, Any]:
+    """
+    Exécute une étape du pipeline en mesurant son coût, puis l'ajoute au rapport.
+
+    Paramètres :
+    - name : nom de l'étape (str), ex : "merge_csv"
+    - func : fonction de l'étape, appelée avec *args et **kwargs ; si elle renvoie
+      un entier, il est enregistré comme nombre de lignes en sortie
+    - nh_folder : dossier du corpus, où est écrit le rapport (str ou Path)
+    - rows_in : nombre de lignes en entrée (int, ex : rows_out de l'étape
+      précédente ; optionnel)
+    - run_id : identifiant de l'exécution (str, défaut : nouvel horodatage)
+    - cprofile_dir : dossier où enregistrer un profil cProfile par étape
+      (<run_id>_<name>.prof, lisible avec pstats ou snakeviz ; optionnel)
+    - trace_memory : mesure le pic mémoire avec tracemalloc (bool, défaut True ;
+      ralentit l'étape)
+
+    Retour :
+    - Enregistrement de l'étape (dict) : temps réel et CPU (s), pic mémoire (Mo),
+      lignes avant / après, statut et éventuelle erreur
+
+    Effets :
+    - Ajoute une ligne JSON à "profilage_runs.jsonl" dans nh_folder
+    - Relance l'exception de l'étape après l'avoir enregistrée
+    """
+
+    run_id = run_id or new_run_id()
+
+    profiler = cProfile.Profile() if cprofile_dir else None
+    if trace_memory:
+        tracemalloc.start()
+
+    error = None
+    result = None
+    started_at = datetime.now().isoformat(timespec="seconds")
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        if profiler:
+            profiler.enable()
+        result = func(*args, **kwargs)
+    except Exception as e:
+        error = e
+    finally:
+        if profiler:
+            profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+    record = {
+        "run_id": run_id,
+        "stage": name,
+        "started_at": started_at,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "peak_memory_mb": round(peak / 2**20, 2) if peak is not None else None,
+        "rows_in": rows_in,
+        "rows_out": result if isinstance(result, int) else None,
+        "status": "ok" if error is None else "erreur",
+        "error": None if error is None else f"{type(error).__name__}: {error}",
+        "cprofile": None,
+    }
+
+    if profiler:
+        cprofile_dir = Path(cprofile_dir)
+        cprofile_dir.mkdir(parents=True, exist_ok=True)
+        prof_path = cprofile_dir / f"{run_id}_{name}.prof"
+        profiler.dump_stats(prof_path)
+        record["cprofile"] = str(prof_path)
+
+    with open(Path(nh_folder) / REPORT_FILE, "a", encoding="utf-8") as report:
+        report.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"⏱️ {name} : {record['wall_s']} s, CPU {record['cpu_s']} s, "
+          f"pic mémoire {record['peak_memory_mb']} Mo, lignes {rows_in} → {record['rows_out']}")
+
+    if error is not None:
+        raise error
+    return record
+
+def load_report(nh_folder: str | Path) -> pd.DataFrame:
+    """
+    Charge le rapport de profilage de toutes les exécutions, pour comparer
+    les étapes d'une exécution à l'autre.
+
+    Paramètres :
+    - nh_folder : dossier contenant "profilage_runs.jsonl" (str ou Path)
+
+    Retour :
+    - DataFrame (une ligne par étape et par exécution)
+
+    Exemple :
+    - load_report(nh_folder).pivot(index="run_id", columns="stage", values="wall_s")
+    """
+
+    return pd.read_json(Path(nh_folder) / REPORT_FILE, lines=True)
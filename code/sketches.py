@@ -0,0 +1,331 @@
+from typing import Any, Hashable, Iterable
+from pathlib import Path
+import hashlib
+import math
+import pickle
+import numpy as np
+
+
+
+# ---------------------------------------
+#   Statistiques approchées en flux (crawl)
+# ---------------------------------------
+
+# Pendant le crawl, chaque ligne émise par retrieve_img_data alimente des
+# résumés de taille fixe :
+# - Count-Min Sketch : fréquences des mots-clés et des paires de mots-clés
+# - HyperLogLog : nombre de manuscrits / folios distincts (global et par mot-clé)
+# - Space-Saving : mots-clés et paires les plus fréquents (top-k)
+# Les paires ne se déduisent pas du flux (chaque ligne ne porte que le mot-clé
+# recherché) : elles sont comptées à partir des mots-clés complets d'une image,
+# lus dans la base SQLite pendant le crawl (db_path), et recomptées en fin de
+# fusion par merge_csv (rebuild_pairs) si les statistiques ont été enregistrées.
+# Les hachages sont déterministes (blake2b) : les résumés de plusieurs
+# processus de crawl peuvent être fusionnés avec merge().
+
+STATS_FILE = "statistiques_crawl.pkl"
+
+
+def _hash128(key: Hashable, seed: int = 0) -> tuple[int, int]:
+    """Deux hachages 64 bits indépendants et stables d'une clé."""
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16,
+                             salt=seed.to_bytes(16, "little")).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+class CountMinSketch:
+    """
+    Fréquences approchées : l'estimation ne sous-estime jamais, et dépasse
+    la vraie valeur d'au plus e/width × total avec probabilité 1 - exp(-depth).
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, seed: int = 0) -> None:
+        self.width, self.depth, self.seed = width, depth, seed
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, key: Hashable) -> np.ndarray:
+        h1, h2 = _hash128(key, self.seed)
+        # double hachage : une position par ligne à partir de deux hachages
+        return np.array([(h1 + i * h2) % self.width for i in range(self.depth)])
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        self.table[np.arange(self.depth), self._columns(key)] += count
+        self.total += count
+
+    def estimate(self, key: Hashable) -> int:
+        return int(self.table[np.arange(self.depth), self._columns(key)].min())
+
+    def merge(self, other: "CountMinSketch") -> None:
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("Count-Min Sketch de paramètres différents : fusion impossible")
+        self.table += other.table
+        self.total += other.total
+
+
+class HyperLogLog:
+    """
+    Nombre approché d'éléments distincts, avec 2**precision registres
+    (erreur relative ≈ 1.04 / sqrt(2**precision), soit ~3 % pour precision=10).
+    """
+
+    def __init__(self, precision: int = 10, seed: int = 0) -> None:
+        self.precision, self.seed = precision, seed
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def add(self, key: Hashable) -> None:
+        h, _ = _hash128(key, self.seed)
+        idx = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        # rang du premier bit à 1 dans les bits restants
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+
+        # petites cardinalités : comptage linéaire des registres vides
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if (self.precision, self.seed) != (other.precision, other.seed):
+            raise ValueError("HyperLogLog de paramètres différents : fusion impossible")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+
+class SpaceSaving:
+    """
+    Éléments les plus fréquents (heavy hitters) avec au plus `capacity` compteurs.
+    Tout élément de fréquence > total / capacity est conservé ; son compteur
+    surestime la vraie fréquence d'au plus son erreur.
+    """
+
+    def __init__(self, capacity: int = 100) -> None:
+        self.capacity = capacity
+        self.counts: dict[Hashable, int] = {}
+        self.errors: dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            # on remplace l'élément le moins compté, dont on hérite le compteur
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            self.errors.pop(victim)
+            self.counts[key] = floor + count
+            self.errors[key] = floor
+
+    def top(self, k: int | None = None) -> list[tuple[Hashable, int]]:
+        items = sorted(self.counts.items(), key=lambda x: -x[1])
+        return items[:k] if k is not None else items
+
+    def merge(self, other: "SpaceSaving") -> None:
+        # un élément absent d'un résumé plein y a au plus son compteur minimal
+        floor_self = min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+        floor_other = min(other.counts.values()) if len(other.counts) >= other.capacity else 0
+
+        counts, errors = {}, {}
+        for key in self.counts.keys() | other.counts.keys():
+            counts[key] = self.counts.get(key, floor_self) + other.counts.get(key, floor_other)
+            errors[key] = self.errors.get(key, floor_self) + other.errors.get(key, floor_other)
+
+        keep = sorted(counts, key=counts.get, reverse=True)[:self.capacity]
+        self.counts = {k: counts[k] for k in keep}
+        self.errors = {k: errors[k] for k in keep}
+
+
+class KeywordStats:
+    """
+    Statistiques de crawl par mot-clé, en mémoire fixe et fusionnables.
+
+    Paramètres :
+    - width / depth : taille des Count-Min Sketch (fréquences mots-clés et paires)
+    - precision : précision des HyperLogLog (2**precision registres chacun)
+    - top_k : nombre de compteurs Space-Saving (mots-clés et paires)
+    - max_keywords : nombre maximal de mots-clés suivis pour les manuscrits
+      distincts par mot-clé (un HyperLogLog chacun)
+
+    Mémoire (bornée, indépendante du nombre de lignes) :
+    - 2 × depth × width × 8 octets pour les Count-Min Sketch (128 Ko par défaut)
+    - au plus (max_keywords + 2) × 2**precision octets pour les HyperLogLog
+      (2 Mo par défaut, ~1,2 Mo pour les 1 231 mots-clés de MotsCles.txt)
+    - 2 × top_k compteurs Space-Saving
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, precision: int = 10,
+                 top_k: int = 100, max_keywords: int = 2048) -> None:
+        self.precision = precision
+        self.max_keywords = max_keywords
+
+        self.kw_freq = CountMinSketch(width, depth, seed=1)
+        self.pair_freq = CountMinSketch(width, depth, seed=2)
+        self.top_keywords = SpaceSaving(top_k)
+        self.top_pairs = SpaceSaving(top_k)
+        self.manuscripts = HyperLogLog(precision, seed=3)
+        self.folios = HyperLogLog(precision, seed=4)
+        self.kw_manuscripts: dict[str, HyperLogLog] = {}
+
+    def _add_pair(self, kw_a: str, kw_b: str) -> None:
+        pair = tuple(sorted((kw_a, kw_b)))
+        self.pair_freq.add(pair)
+        self.top_pairs.add(pair)
+
+    def update(self, row: list[str], mot_cle: str,
+               known_keywords: Iterable[str] | None = None) -> None:
+        """
+        Ajoute une ligne [img_url, manuscrit, folio, légende, texte, artiste, lieu, date]
+        émise par retrieve_img_data pour le mot-clé recherché.
+
+        Paramètres :
+        - row : ligne extraite par retrieve_img_data
+        - mot_cle : mot-clé de la recherche (str)
+        - known_keywords : tous les mots-clés déjà associés à l'image, avant cette
+          ligne (ex : lus dans la base, voir database.image_keywords ; optionnel).
+          Sans eux, les paires ne sont pas comptées.
+
+        Règles :
+        - Chaque paire d'une image est comptée une fois, à l'arrivée de son
+          second mot-clé ; une image recrawlée pour un mot-clé connu n'ajoute rien
+        """
+
+        _, manuscrit, folio = row[:3]
+        ms_folio = f"{manuscrit}:{folio}"
+
+        self.kw_freq.add(mot_cle)
+        self.top_keywords.add(mot_cle)
+        self.manuscripts.add(manuscrit)
+        self.folios.add(ms_folio)
+
+        # au-delà de max_keywords, un nouveau mot-clé n'a pas de compte par manuscrit
+        if mot_cle not in self.kw_manuscripts and len(self.kw_manuscripts) < self.max_keywords:
+            self.kw_manuscripts[mot_cle] = HyperLogLog(self.precision, seed=3)
+        if mot_cle in self.kw_manuscripts:
+            self.kw_manuscripts[mot_cle].add(manuscrit)
+
+        # paires : mot-clé courant × mots-clés déjà associés à l'image
+        if known_keywords is not None:
+            known_keywords = set(known_keywords)
+            if mot_cle not in known_keywords:
+                for other in known_keywords:
+                    self._add_pair(mot_cle, other)
+
+    def update_pairs(self, keywords: Iterable[str]) -> None:
+        """
+        Compte toutes les paires des mots-clés complets d'une image.
+        """
+
+        keywords = sorted(set(keywords))
+        for i, kw_a in enumerate(keywords):
+            for kw_b in keywords[i + 1:]:
+                self._add_pair(kw_a, kw_b)
+
+    def rebuild_pairs(self, images_keywords: Iterable[Iterable[str]]) -> None:
+        """
+        Remplace les statistiques de paires par celles des mots-clés complets de
+        chaque image (appelé par merge_csv, une liste de mots-clés par image).
+        """
+
+        self.pair_freq = CountMinSketch(self.pair_freq.width, self.pair_freq.depth,
+                                        self.pair_freq.seed)
+        self.top_pairs = SpaceSaving(self.top_pairs.capacity)
+        for keywords in images_keywords:
+            self.update_pairs(keywords)
+
+    def update_rows(self, rows: Iterable[list[str]], mot_cle: str,
+                    known_keywords: Iterable[Iterable[str]] | None = None) -> None:
+        """
+        Ajoute toutes les lignes d'une page de résultats (known_keywords :
+        mots-clés déjà associés à l'image de chaque ligne, optionnel).
+        Une image présente deux fois sur la page n'ajoute ses paires qu'une fois.
+        """
+
+        if known_keywords is None:
+            for row in rows:
+                self.update(row, mot_cle)
+            return
+
+        seen = set()
+        for row, known in zip(rows, known_keywords):
+            image = tuple(row[:4])
+            self.update(row, mot_cle, None if image in seen else known)
+            seen.add(image)
+
+    def keyword_frequency(self, mot_cle: str) -> int:
+        """Nombre approché de lignes (images) pour un mot-clé (jamais sous-estimé)."""
+        return self.kw_freq.estimate(mot_cle)
+
+    def pair_frequency(self, kw_a: str, kw_b: str) -> int:
+        """
+        Nombre approché d'images portant les deux mots-clés (seulement les
+        images dont les mots-clés complets ont été fournis).
+        """
+        return self.pair_freq.estimate(tuple(sorted((kw_a, kw_b))))
+
+    def distinct_manuscripts(self, mot_cle: str | None = None) -> int | None:
+        """
+        Nombre approché de manuscrits distincts, au total ou pour un mot-clé
+        (None pour un mot-clé non suivi, au-delà de max_keywords).
+        """
+        if mot_cle is None:
+            return self.manuscripts.count()
+        hll = self.kw_manuscripts.get(mot_cle)
+        return hll.count() if hll else None
+
+    def distinct_folios(self) -> int:
+        """Nombre approché de folios (ms_folio) distincts."""
+        return self.folios.count()
+
+    def summary(self, k: int = 20) -> dict[str, Any]:
+        """Résumé pour un tableau de bord : totaux et top-k."""
+        return {
+            "lignes": self.kw_freq.total,
+            "manuscrits_distincts": self.distinct_manuscripts(),
+            "folios_distincts": self.distinct_folios(),
+            "top_mots_cles": [
+                (kw, n, self.distinct_manuscripts(kw)) for kw, n in self.top_keywords.top(k)
+            ],
+            "top_paires": [
+                (" | ".join(pair), n) for pair, n in self.top_pairs.top(k)
+            ],
+        }
+
+    def merge(self, other: "KeywordStats") -> None:
+        """
+        Fusionne les statistiques d'un autre processus de crawl.
+        """
+
+        self.kw_freq.merge(other.kw_freq)
+        self.pair_freq.merge(other.pair_freq)
+        self.top_keywords.merge(other.top_keywords)
+        self.top_pairs.merge(other.top_pairs)
+        self.manuscripts.merge(other.manuscripts)
+        self.folios.merge(other.folios)
+        for kw, hll in other.kw_manuscripts.items():
+            if kw in self.kw_manuscripts:
+                self.kw_manuscripts[kw].merge(hll)
+            elif len(self.kw_manuscripts) < self.max_keywords:
+                self.kw_manuscripts[kw] = HyperLogLog(hll.precision, hll.seed)
+                self.kw_manuscripts[kw].merge(hll)
+
+    def save(self, path: str | Path) -> None:
+        """Enregistre les statistiques (pickle) pour un tableau de bord ou une fusion."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path: str | Path) -> "KeywordStats":
+        """Charge des statistiques enregistrées par save()."""
+        with open(path, "rb") as f:
+            return pickle.load(f)
@@ -0,0 +1,79 @@
+from pathlib import Path
+import sqlite3
+
+import pandas as pd
+
+import clean_files
+from aggregates import aggregate_frame, counted_rows, load_aggregates, refresh_aggregates
+from database import DB_FILE, upsert_scraped_rows
+
+
+# Pages extraites par retrieve_img_data, par mot-clé ; la légende de la
+# première image contient un ';' (remplacé par ':' par clean_csv)
+PAGES = {
+    "flore": [
+        ["u1", "Latin 1", "f. 1r", "Flore ; plante", "texte", "", "Paris (France)", "1201-1300"],
+        ["u2", "Latin 2", "f. 2v", "Faune", "texte", "Maître X", "Rome", "XIVe siècle"],
+    ],
+    "plante": [
+        ["u1", "Latin 1", "f. 1r", "Flore ; plante", "texte", "", "Paris (France)", "1201-1300"],
+    ],
+}
+COLUMNS = ['img_url', 'manuscrit', 'folio', 'caption', 'texte', 'artiste', 'lieu', 'date']
+
+
+def _crawl(nh_folder: Path, pages: dict[str, list[list[str]]] = PAGES) -> None:
+    """Reproduit browse_results avec db_path : un CSV et un upsert par mot-clé."""
+    for mot_cle, rows in pages.items():
+        upsert_scraped_rows(nh_folder / DB_FILE, rows, mot_cle)
+        pd.DataFrame(rows, columns=COLUMNS).to_csv(
+            nh_folder / f"gallica_data_{mot_cle}.csv", index=False, encoding="utf-8")
+
+def _run_pipeline(nh_folder: Path) -> int:
+    clean_files.clean_csv(nh_folder)
+    known_rows = counted_rows(nh_folder)
+    rows = clean_files.merge_csv(nh_folder, from_db=True)
+    clean_files.fill_empty_cells(nh_folder)
+    clean_files.fix_dates(clean_files.corrected_dates, clean_files.dates_to_clean,
+                          clean_files.egyptian_dynasty, nh_folder)
+    clean_files.clean_century(nh_folder)
+    clean_files.clean_places(nh_folder)
+    clean_files.save_database(nh_folder)
+    refresh_aggregates(nh_folder, known_rows)
+    return rows
+
+def _kw_counts(cube: pd.DataFrame) -> dict:
+    return cube.groupby(["caption", "mot_cle"])["counts"].sum().to_dict()
+
+def test_crawled_and_cleaned_rows_share_one_image(tmp_path: Path):
+    _crawl(tmp_path)
+
+    # deux exécutions : la seconde relit la base nettoyée avec les CSV
+    for _ in range(2):
+        assert _run_pipeline(tmp_path) == 3
+
+    conn = sqlite3.connect(tmp_path / DB_FILE)
+    images = conn.execute("SELECT img_url, caption, siecle FROM images ORDER BY img_url").fetchall()
+    links = conn.execute("SELECT COUNT(*) FROM image_keywords").fetchone()[0]
+    conn.close()
+
+    assert images == [("u1", "Flore : plante", "XIIIe siècle"), ("u2", "Faune", "XIVe siècle")]
+    assert links == 3
+
+def test_aggregates_are_updated_with_new_rows_only(tmp_path: Path):
+    _crawl(tmp_path)
+    _run_pipeline(tmp_path)
+    # nouveau mot-clé : une image déjà connue et une nouvelle image
+    _crawl(tmp_path, {"faune": [
+        ["u2", "Latin 2", "f. 2v", "Faune", "texte", "Maître X", "Rome", "XIVe siècle"],
+        ["u3", "Latin 3", "f. 3r", "Oiseau", "texte", "", "Rome", "1301-1400"],
+    ]})
+    _run_pipeline(tmp_path)
+
+    cube_images, cube_kw = load_aggregates(tmp_path)
+    df = pd.read_csv(tmp_path / "mandragore_nh_global.csv", sep=";")
+    expected_images, expected_kw = aggregate_frame(df)
+
+    assert cube_images["counts"].sum() == expected_images["counts"].sum() == 3
+    assert cube_kw["counts"].sum() == expected_kw["counts"].sum() == 5
+    assert _kw_counts(cube_kw) == _kw_counts(expected_kw)
@@ -0,0 +1,141 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from PIL import Image
+
+from image_dedup import DEDUP_FILE, download_images, image_filename
+
+
+# ---------------------------------------
+#   Images de test servies en local (IIIF)
+# ---------------------------------------
+
+def _jpeg(pixels: np.ndarray, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def _fixture_images() -> dict[str, np.ndarray]:
+    """
+    Trois enluminures : 'cerf', sa copie retouchée 'cerf-copie' (plus claire,
+    recompressée) et 'lion', sans rapport.
+    """
+
+    y, x = np.mgrid[0:256, 0:256]
+    cerf = 127 + 100 * np.sin(x / 23) * np.cos(y / 31)
+    lion = 127 + 100 * np.sign(np.sin(x / 9 + y / 17))
+    rgb = lambda a: np.stack([a, a, a], axis=-1).clip(0, 255)
+    return {"cerf": rgb(cerf), "cerf-copie": rgb(cerf + 12), "lion": rgb(lion)}
+
+
+class _IIIFHandler(BaseHTTPRequestHandler):
+    """Sert /iiif/<id>/full/<taille>/0/default.jpg à partir des images de test."""
+
+    images: dict[str, np.ndarray] = {}
+    requested: list[str] = []
+
+    def do_GET(self) -> None:
+        self.requested.append(self.path)
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 6 or parts[1] not in self.images:
+            self.send_error(404)
+            return
+
+        pixels = self.images[parts[1]]
+        if parts[3] != "max":
+            width = int(parts[3].rstrip(","))
+            img = Image.fromarray(pixels.astype(np.uint8)).resize((width, width))
+            pixels = np.asarray(img)
+        body = _jpeg(pixels, quality=75 if parts[1] == "cerf-copie" else 90)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def iiif_server():
+    _IIIFHandler.images = _fixture_images()
+    _IIIFHandler.requested = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IIIFHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/iiif"
+    yield base, _IIIFHandler.requested
+    server.shutdown()
+    server.server_close()
+
+def _url(base: str, name: str) -> str:
+    return f"{base}/{name}/full/max/0/default.jpg"
+
+
+# ---------------------------------------
+#                 Tests
+# ---------------------------------------
+
+def test_near_duplicate_is_not_downloaded(iiif_server, tmp_path: Path):
+    base, requested = iiif_server
+    urls = [_url(base, "cerf"), _url(base, "cerf-copie"), _url(base, "lion"), _url(base, "cerf")]
+
+    result = download_images(urls, tmp_path)
+
+    canonical = dict(zip(result.img_url, result.canonical_url))
+    assert canonical == {
+        _url(base, "cerf"): _url(base, "cerf"),
+        _url(base, "cerf-copie"): _url(base, "cerf"),
+        _url(base, "lion"): _url(base, "lion"),
+    }
+    # pleine résolution : seulement les deux images canoniques
+    assert sum("/full/max/" in path for path in requested) == 2
+    assert sorted(p.name for p in tmp_path.glob("*.jpg")) == sorted(
+        [image_filename(_url(base, "cerf")), image_filename(_url(base, "lion"))]
+    )
+
+    saved = pd.read_csv(tmp_path / DEDUP_FILE, sep=";", dtype=str)
+    assert saved.equals(result.astype(str))
+
+def test_records_survive_a_crash_and_are_not_refetched(iiif_server, tmp_path: Path):
+    base, requested = iiif_server
+    urls = [_url(base, "cerf"), _url(base, "lion"), _url(base, "cerf-copie")]
+
+    class CrashingSession(requests.Session):
+        """Session qui s'interrompt à la troisième vignette."""
+        def get(self, url, **kwargs):
+            if url == urls[2].replace("/full/max/", "/full/64,/"):
+                raise KeyboardInterrupt
+            return super().get(url, **kwargs)
+
+    with pytest.raises(KeyboardInterrupt):
+        download_images(urls, tmp_path, session=CrashingSession())
+
+    saved = pd.read_csv(tmp_path / DEDUP_FILE, sep=";", dtype=str)
+    assert list(saved.img_url) == urls[:2]
+
+    requested.clear()
+    result = download_images(urls, tmp_path)
+
+    # seule l'image manquante est traitée, et rattachée à 'cerf' déjà connu
+    assert requested == ["/iiif/cerf-copie/full/64,/0/default.jpg"]
+    assert list(result.img_url) == urls
+    assert result.canonical_url.iloc[-1] == _url(base, "cerf")
+
+def test_empty_dedup_file_is_treated_as_no_records(iiif_server, tmp_path: Path):
+    base, _ = iiif_server
+    (tmp_path / DEDUP_FILE).touch()
+
+    result = download_images([_url(base, "lion")], tmp_path)
+
+    assert list(result.img_url) == [_url(base, "lion")]
+    saved = pd.read_csv(tmp_path / DEDUP_FILE, sep=";", dtype=str)
+    assert list(saved.columns) == ["img_url", "phash", "canonical_url", "fichier"]
@@ -0,0 +1,277 @@
+from typing import Iterable, NamedTuple
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+
+# ---------------------------------------
+#    Vocabulaire des mots-clés (internés)
+# ---------------------------------------
+
+# Chaque mot-clé reçoit un identifiant entier stable : sa position dans
+# data/MotsCles.txt, les nouveaux mots-clés étant ajoutés à la suite.
+# L'appartenance folio → mots-clés est stockée au format CSR : les
+# identifiants (int32) des mots-clés du folio i sont
+# ids[offsets[i]:offsets[i + 1]], triés et sans doublons.
+
+CSR_FOLIOS_FILE = "folios.npy"
+CSR_OFFSETS_FILE = "offsets.npy"
+CSR_IDS_FILE = "ids.npy"
+CSR_KEYWORDS_FILE = "mots_cles.npy"
+
+# Table CSR du rapport et attributs par folio (lus en mmap par batch_report.py)
+CSR_FOLDER = "folios_mots_cles"
+FOLIO_ATTRIBUTES = ["siecle", "pays_region"]
+
+
+class KeywordCSR(NamedTuple):
+    folios: np.ndarray    # libellés des folios (str)
+    offsets: np.ndarray   # int64, taille len(folios) + 1
+    ids: np.ndarray       # int32, identifiants des mots-clés par folio
+    keywords: np.ndarray  # identifiant -> mot-clé (str)
+
+    def folio_ids(self, i: int) -> np.ndarray:
+        """Identifiants des mots-clés du folio i."""
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def folio_keywords(self, i: int) -> list[str]:
+        """Mots-clés du folio i."""
+        return self.keywords[self.folio_ids(i)].tolist()
+
+    def lengths(self) -> np.ndarray:
+        """Nombre de mots-clés par folio."""
+        return np.diff(self.offsets)
+
+
+def read_vocabulary(kw_file: str | Path) -> list[str]:
+    """
+    Lit un fichier de mots-clés (1 par ligne) en conservant l'ordre du fichier.
+
+    Paramètres :
+    - kw_file : chemin du fichier de mots-clés, ex : data/MotsCles.txt (str ou Path)
+
+    Retour :
+    - Liste des mots-clés, sans doublons ni lignes vides (list[str])
+    """
+
+    vocabulary = []
+    seen = set()
+    with open(kw_file, 'r', encoding='utf-8') as kws:
+        for kw in kws:
+            kw = kw.strip()
+            if kw and kw not in seen:
+                seen.add(kw)
+                vocabulary.append(kw)
+
+    return vocabulary
+
+def write_vocabulary(vocabulary: Iterable[str], file: str | Path) -> None:
+    """
+    Écrit un vocabulaire dans un fichier texte, 1 mot-clé par ligne
+    (l'identifiant d'un mot-clé est son numéro de ligne, à partir de 0).
+
+    Paramètres :
+    - vocabulary : mots-clés dans l'ordre des identifiants (itérable de str)
+    - file : fichier de sortie (str ou Path)
+    """
+
+    with open(file, 'w', encoding='utf-8') as f:
+        f.writelines(kw + '\n' for kw in vocabulary)
+
+def extend_vocabulary(vocabulary: list[str], keywords: Iterable[str]) -> dict[str, int]:
+    """
+    Ajoute au vocabulaire les mots-clés qu'il ne contient pas encore, sans
+    modifier les identifiants existants.
+
+    Paramètres :
+    - vocabulary : liste des mots-clés, modifiée sur place (list[str])
+    - keywords : mots-clés rencontrés dans les données (itérable de str)
+
+    Retour :
+    - Dictionnaire mot-clé -> identifiant pour le vocabulaire complété
+
+    Règles :
+    - Les nouveaux mots-clés sont ajoutés à la suite, triés
+    """
+
+    known = set(vocabulary)
+    vocabulary.extend(sorted({str(kw) for kw in keywords} - known))
+    return {kw: i for i, kw in enumerate(vocabulary)}
+
+def build_folio_csr(df: pd.DataFrame,
+                    vocabulary: list[str] | None = None,
+                    folio_col: str = 'vrai_folio',
+                    kw_col: str = 'mots_cles',
+                    sep: str = '|') -> KeywordCSR:
+    """
+    Construit la table folio → mots-clés au format CSR.
+
+    Paramètres :
+    - df : DataFrame contenant une colonne de folios et une colonne de mots-clés,
+      soit un mot-clé par ligne ('mot_cle'), soit des mots-clés joints par sep ('mots_cles')
+    - vocabulary : vocabulaire de référence, complété sur place si besoin
+      (list[str], optionnel ; ex : read_vocabulary(KW_FILE))
+    - folio_col : colonne identifiant le folio (str, défaut 'vrai_folio')
+    - kw_col : colonne des mots-clés (str, défaut 'mots_cles')
+    - sep : séparateur des mots-clés joints (str, défaut '|')
+
+    Retour :
+    - KeywordCSR (folios dans leur ordre d'apparition)
+
+    Règles :
+    - Les chaînes ne sont découpées qu'une fois, puis remplacées par leurs identifiants
+    - Les mots-clés vides ou manquants sont ignorés
+    """
+
+    if vocabulary is None:
+        vocabulary = []
+
+    # index positionnel : après explode, l'index renvoie à la ligne d'origine
+    df = df[[folio_col, kw_col]].reset_index(drop=True)
+
+    kws = (
+        df[kw_col].astype("string").str.split(sep)
+        .explode().str.strip()
+    )
+    kws = kws[kws.notna() & (kws != "")]
+
+    folio_codes, folios = pd.factorize(df[folio_col], use_na_sentinel=False)
+    folio_codes = folio_codes[kws.index.to_numpy()]
+
+    kw_codes, kw_uniques = pd.factorize(kws)
+    kw_ids = extend_vocabulary(vocabulary, kw_uniques)
+    lookup = np.array([kw_ids[kw] for kw in kw_uniques], dtype=np.int64)
+
+    pairs = np.unique(np.stack([folio_codes.astype(np.int64), lookup[kw_codes]], axis=1), axis=0) \
+        if len(kw_codes) else np.empty((0, 2), dtype=np.int64)
+
+    offsets = np.zeros(len(folios) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=len(folios)), out=offsets[1:])
+
+    return KeywordCSR(
+        folios=np.asarray(folios.astype(str), dtype=str),
+        offsets=offsets,
+        ids=pairs[:, 1].astype(np.int32),
+        keywords=np.asarray(vocabulary, dtype=str),
+    )
+
+def csr_to_lists(csr: KeywordCSR) -> list[list[str]]:
+    """
+    Décode la table CSR en listes de mots-clés par folio (format de df_cooc['kw']).
+
+    Paramètres :
+    - csr : table folio → mots-clés (KeywordCSR)
+
+    Retour :
+    - Liste des mots-clés de chaque folio, dans l'ordre des folios
+    """
+
+    words = csr.keywords[csr.ids].tolist()
+    return [words[a:b] for a, b in zip(csr.offsets[:-1].tolist(), csr.offsets[1:].tolist())]
+
+def select_folios(csr: KeywordCSR, selection: np.ndarray) -> KeywordCSR:
+    """
+    Extrait une sous-table CSR limitée à certains folios.
+
+    Paramètres :
+    - csr : table folio → mots-clés (KeywordCSR)
+    - selection : masque booléen ou positions des folios à garder (np.ndarray)
+
+    Retour :
+    - KeywordCSR restreinte, partageant le même vocabulaire
+    """
+
+    positions = np.flatnonzero(selection) if np.asarray(selection).dtype == bool \
+        else np.asarray(selection, dtype=np.int64)
+    starts = np.asarray(csr.offsets[positions])
+    lengths = np.asarray(csr.offsets[positions + 1]) - starts
+
+    offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # positions de chaque identifiant gardé dans csr.ids
+    gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+    return KeywordCSR(
+        folios=csr.folios[positions],
+        offsets=offsets,
+        ids=np.asarray(csr.ids[gather], dtype=np.int32),
+        keywords=csr.keywords,
+    )
+
+def save_csr(csr: KeywordCSR, folder: str | Path) -> Path:
+    """
+    Enregistre la table CSR sous forme de fichiers .npy.
+
+    Paramètres :
+    - csr : table folio → mots-clés (KeywordCSR)
+    - folder : dossier de sortie, créé si besoin (str ou Path)
+
+    Retour :
+    - Chemin du dossier (Path)
+    """
+
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    np.save(folder / CSR_FOLIOS_FILE, csr.folios)
+    np.save(folder / CSR_OFFSETS_FILE, csr.offsets)
+    np.save(folder / CSR_IDS_FILE, csr.ids)
+    np.save(folder / CSR_KEYWORDS_FILE, csr.keywords)
+
+    print(f"Table folios → mots-clés enregistrée : {folder}")
+    return folder
+
+def load_csr(folder: str | Path, mmap: bool = True) -> KeywordCSR:
+    """
+    Charge une table CSR enregistrée par save_csr.
+
+    Paramètres :
+    - folder : dossier contenant les fichiers .npy (str ou Path)
+    - mmap : ouvre offsets et ids en mémoire partagée (bool, défaut True)
+
+    Retour :
+    - KeywordCSR
+    """
+
+    folder = Path(folder)
+    mode = 'r' if mmap else None
+
+    return KeywordCSR(
+        folios=np.load(folder / CSR_FOLIOS_FILE),
+        offsets=np.load(folder / CSR_OFFSETS_FILE, mmap_mode=mode),
+        ids=np.load(folder / CSR_IDS_FILE, mmap_mode=mode),
+        keywords=np.load(folder / CSR_KEYWORDS_FILE),
+    )
+
+def prepare_report_data(df: pd.DataFrame,
+                        nh_folder: str | Path,
+                        vocabulary: list[str] | None = None,
+                        folio_col: str = 'vrai_folio',
+                        kw_col: str = 'mots_cles') -> Path:
+    """
+    Enregistre la table CSR folio → mots-clés et les attributs de chaque folio
+    (siècle, pays/région), lus ensuite en mmap par les processus du rapport.
+
+    Paramètres :
+    - df : DataFrame groupé (colonnes folio_col, kw_col, 'siecle', 'pays_region')
+    - nh_folder : dossier des données (str ou Path)
+    - vocabulary : vocabulaire de référence (list[str], optionnel)
+    - folio_col : colonne identifiant le folio (str, défaut 'vrai_folio')
+    - kw_col : colonne des mots-clés (str, défaut 'mots_cles')
+
+    Retour :
+    - Dossier de la table CSR (Path)
+    """
+
+    folder = Path(nh_folder) / CSR_FOLDER
+    csr = build_folio_csr(df, vocabulary, folio_col=folio_col, kw_col=kw_col)
+    save_csr(csr, folder)
+
+    # un attribut par folio, aligné sur csr.folios (première valeur rencontrée)
+    first = df.drop_duplicates(subset=[folio_col]).set_index(folio_col)
+    for col in FOLIO_ATTRIBUTES:
+        values = first[col].reindex(csr.folios).fillna("").astype(str).to_numpy()
+        np.save(folder / f"{col}.npy", np.asarray(values, dtype=str))
+
+    return folder